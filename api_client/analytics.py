@@ -0,0 +1,154 @@
+"""Vectorized analytics of the historical data panel.
+Every function works on (dates, tickers) arrays at once. The rolling statistics are computed
+from cumulative sums, and accept the last rows of the previous call (`tail`) so that bars
+appended later are processed without recomputing the whole history."""
+
+import numpy as np
+import pandas as pd
+
+from api_client.metrics import get_metrics
+
+METRICS = ("Log return", "Moving average", "Volatility", "Drawdown")
+
+
+def log_returns(prices, last=None) -> np.ndarray:
+    """Log return of every bar; `last` is the row of prices preceding `prices`, if any"""
+    prices = np.asarray(prices, dtype=np.float64)
+    if last is None:
+        last = np.full((1, prices.shape[1]), np.nan)
+    previous = np.vstack([np.reshape(last, (1, -1)), prices[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.log(prices / previous)
+
+
+def _window_sums(values, window, tail=None):
+    """Sums of the values, of their squares and counts of the non-NaN values over the
+    `window` rows ending at each row of `values`. `tail` is prepended and left out of the
+    results."""
+    values = np.asarray(values, dtype=np.float64)
+    skip = 0
+    if tail is not None and len(tail):
+        skip = len(tail)
+        values = np.vstack([tail, values])
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+
+    pad = np.zeros((window, values.shape[1]))
+    sums = []
+    for data in (filled, filled * filled, valid.astype(np.float64)):
+        cumulative = np.vstack([pad, np.cumsum(data, axis=0)])
+        sums.append((cumulative[window:] - cumulative[:-window])[skip:])
+    return sums
+
+
+def moving_average(values, window, tail=None) -> np.ndarray:
+    """Mean of the last `window` rows, NaN until `window` values are available"""
+    total, _, count = _window_sums(values, window, tail)
+    with np.errstate(invalid="ignore"):
+        return np.where(count >= window, total / window, np.nan)
+
+
+def rolling_volatility(returns, window, tail=None, periods_per_year=365) -> np.ndarray:
+    """Annualized standard deviation of the last `window` returns"""
+    total, squares, count = _window_sums(returns, window, tail)
+    with np.errstate(invalid="ignore"):
+        variance = (squares - total * total / window) / (window - 1)
+    variance = np.maximum(variance, 0.0)  # rounding can leave tiny negative values
+    return np.where(count >= window, np.sqrt(variance * periods_per_year), np.nan)
+
+
+def drawdown(prices, peak=None):
+    """Relative distance of each price to the highest price so far, and the running peak.
+    `peak` is the running peak at the end of the previous call, if any."""
+    prices = np.asarray(prices, dtype=np.float64)
+    start = 0 if peak is None else 1
+    if peak is not None:
+        prices = np.vstack([np.reshape(peak, (1, -1)), prices])
+    running = np.fmax.accumulate(prices, axis=0)
+    with np.errstate(invalid="ignore"):
+        return (prices / running - 1.0)[start:], running[-1]
+
+
+def correlation(returns, tickers=None) -> pd.DataFrame:
+    """Pairwise correlation of the tickers' returns over the dates both have data for"""
+    return pd.DataFrame(returns, columns=tickers).corr()
+
+
+class PanelAnalytics:
+    """Metrics of one field of a Panel, kept in sync with it by `update`.
+    When the panel only gained bars at the end of its index, `update` computes the metrics of
+    the new bars from the state kept at the end of the previous update; any other change
+    (new tickers, bars inserted before the last date) recomputes everything."""
+
+    def __init__(self, panel, window=30, field="Close", periods_per_year=365) -> None:
+        self.panel = panel
+        self.window = window
+        self.field = field
+        self.periods_per_year = periods_per_year
+        self.index = pd.DatetimeIndex([], name="Date")
+        self.tickers = []
+        self._metrics = {}
+        self._state = None
+
+    def _compute(self, prices, state=None):
+        last, price_tail, return_tail, peak = state or (None, None, None, None)
+        returns = log_returns(prices, last)
+        metrics = {"Log return": returns,
+                   "Moving average": moving_average(prices, self.window, price_tail),
+                   "Volatility": rolling_volatility(returns, self.window, return_tail,
+                                                    self.periods_per_year)}
+        metrics["Drawdown"], peak = drawdown(prices, peak)
+
+        keep = self.window - 1
+        prices_seen = prices if price_tail is None else np.vstack([price_tail, prices])
+        returns_seen = returns if return_tail is None else np.vstack([return_tail, returns])
+        self._state = (prices[-1], prices_seen[max(len(prices_seen) - keep, 0):],
+                       returns_seen[max(len(returns_seen) - keep, 0):], peak)
+        return metrics
+
+    def update(self) -> None:
+        with get_metrics().span("analytics.update"):
+            self._update()
+
+    def _update(self):
+        panel = self.panel
+        prices = np.asarray(panel.values(self.field), dtype=np.float64)
+        old_rows = len(self.index)
+        appended = (self._state is not None and panel.tickers == self.tickers
+                    and len(panel.index) > old_rows
+                    and panel.index[:old_rows].equals(self.index))
+
+        if appended:
+            new = self._compute(prices[old_rows:], self._state)
+            self._metrics = {name: np.vstack([self._metrics[name], new[name]]) for name in new}
+        else:
+            self._metrics = self._compute(prices) if len(prices) else {}
+        self.index = panel.index
+        self.tickers = list(panel.tickers)
+
+    def values(self, name) -> np.ndarray:
+        """(dates, tickers) array of the metric `name`"""
+        return self._metrics[name]
+
+    def series(self, name, ticker) -> np.ndarray:
+        return self._metrics[name][:, self.tickers.index(ticker)]
+
+    def metric(self, name) -> pd.DataFrame:
+        return pd.DataFrame(self._metrics[name], index=self.index, columns=self.tickers)
+
+    def correlation(self) -> pd.DataFrame:
+        return correlation(self._metrics["Log return"], self.tickers)
+
+    def to_frame(self, with_fields=False, rows=slice(None)) -> pd.DataFrame:
+        """All the metrics (of the `rows` slice of the dates) as a DataFrame with
+        (ticker, metric) columns, like Panel.to_frame.
+        With `with_fields`, the panel's own fields come first for each ticker."""
+        fields = list(self.panel.fields) if with_fields else []
+        arrays = [self.panel.values(field)[rows] for field in fields]
+        arrays += [self._metrics[name][rows] for name in METRICS]
+        columns = pd.MultiIndex.from_product([self.tickers, fields + list(METRICS)],
+                                             names=["Ticker", "Field"])
+        index = self.index[rows]
+        values = np.stack(arrays, axis=2)
+        return pd.DataFrame(values.reshape(len(index), len(columns)), index=index,
+                            columns=columns)
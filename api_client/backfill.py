@@ -0,0 +1,137 @@
+"""Bulk download of historical bars to one file per ticker, resumable after an interruption.
+Each ticker is fetched, written and dropped by the worker that handled it, so memory use
+does not grow with the number of tickers. Finished tickers are appended to a checkpoint
+file; a later run over the same range skips them."""
+
+import concurrent.futures
+import datetime
+import json
+import os
+import threading
+
+from api_client.cache import to_date
+from api_client.export import export_table
+from api_client.metrics import get_metrics
+
+BACKFILL_FORMATS = ["parquet", "csv"]
+
+
+class Checkpoint:
+    """Append-only JSON-lines record of the tickers already written for a given job, and of
+    the end date they were fetched up to"""
+
+    def __init__(self, path: str, job: dict) -> None:
+        self.path = path
+        self.job = job
+        self._lock = threading.Lock()
+        self.done = set()
+        self.end = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interruption
+                    if entry.get("job") == job:
+                        self.done.add(entry["ticker"])
+                        self.end = self.end or entry.get("end")
+
+    def mark(self, ticker: str, rows: int, end: str) -> None:
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"job": self.job, "ticker": ticker, "rows": rows,
+                                    "end": end}) + "\n")
+            self.done.add(ticker)
+
+
+def partition_path(out_dir: str, ticker: str, exp_format: str) -> str:
+    return os.path.join(out_dir, f"{ticker.replace(':', '_')}.{exp_format}")
+
+
+class Backfill:
+    """Fetch `tickers` with `client` on `workers` threads and write each one to `out_dir`.
+    Bars come from the data sources directly unless `use_cache` routes the daily bars
+    through the client's cache. Without an `end_date` the bars are fetched up to today, and
+    a resumed job keeps the end date the interrupted run started with."""
+
+    def __init__(self, client, tickers, start_date, end_date, out_dir, exp_format="parquet",
+                 timespan="day", workers=8, use_cache=False, restart=False) -> None:
+        if exp_format not in BACKFILL_FORMATS:
+            raise ValueError(f"Backfill format '{exp_format}' not recognized")
+        self.client = client
+        self.tickers = list(tickers)
+        self.start_date = start_date
+        self.out_dir = out_dir
+        self.exp_format = exp_format
+        self.timespan = timespan
+        self.workers = workers
+        self.use_cache = use_cache and timespan == "day"
+
+        os.makedirs(out_dir, exist_ok=True)
+        checkpoint_path = os.path.join(out_dir, "checkpoint.jsonl")
+        if restart and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        job = {"start": str(start_date), "end": str(end_date) if end_date else "today",
+               "timespan": timespan, "format": exp_format}
+        self.checkpoint = Checkpoint(checkpoint_path, job)
+        if end_date is None:
+            end_date = (to_date(self.checkpoint.end) if self.checkpoint.end
+                        else datetime.date.today())
+        self.end_date = end_date
+        self.failed = {}
+
+    def pending(self) -> list:
+        return [ticker for ticker in self.tickers if ticker not in self.checkpoint.done]
+
+    def _fetch(self, ticker):
+        if self.use_cache:
+            return self.client.get_hist_data(ticker, self.start_date, self.end_date)
+        return self.client.get_bars(ticker, self.start_date, self.end_date, self.timespan)
+
+    def _backfill_one(self, ticker) -> int:
+        with get_metrics().span("backfill.ticker"):
+            table = self._fetch(ticker)
+            path = partition_path(self.out_dir, ticker, self.exp_format)
+            # written under a temporary name, so an interrupted write never looks complete
+            try:
+                export_table(table, path + ".part", self.exp_format)
+            except BaseException:
+                if os.path.exists(path + ".part"):
+                    os.remove(path + ".part")
+                raise
+            os.replace(path + ".part", path)
+            self.checkpoint.mark(ticker, len(table), str(self.end_date))
+            return len(table)
+
+    def run(self, progress=None) -> dict:
+        """Backfill the pending tickers, calling `progress(ticker, rows, error)` as each one
+        finishes. At most twice as many tickers as workers are in flight at once."""
+        pending = iter(self.pending())
+        written = {}
+        with concurrent.futures.ThreadPoolExecutor(self.workers,
+                                                   thread_name_prefix="backfill") as pool:
+            running = {}
+
+            def submit_next():
+                ticker = next(pending, None)
+                if ticker is not None:
+                    running[pool.submit(self._backfill_one, ticker)] = ticker
+
+            for _ in range(2 * self.workers):
+                submit_next()
+            while running:
+                finished, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    ticker = running.pop(future)
+                    try:
+                        written[ticker] = future.result()
+                        error = None
+                    except Exception as e:
+                        self.failed[ticker] = e
+                        error = e
+                    if progress is not None:
+                        progress(ticker, written.get(ticker, 0), error)
+                    submit_next()
+        return written
@@ -0,0 +1,210 @@
+"""Persistent on-disk store of daily OHLCV bars, keyed by (ticker, date).
+Requests are answered from the local SQLite database; only the parts of the requested
+range that were not already fetched for a ticker go to the network."""
+
+import datetime
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from api_client.files import ensure_parent_dir
+from api_client.metrics import get_metrics
+from api_client.resample import ROLLUPS, period_bounds, resample_ohlcv
+
+FIELDS = ["High", "Low", "Open", "Close", "Volume", "Adj Close"]
+_COLUMNS = ["high", "low", "open", "close", "volume", "adj_close"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    ticker TEXT NOT NULL,
+    date TEXT NOT NULL,
+    high REAL, low REAL, open REAL, close REAL, volume REAL, adj_close REAL,
+    PRIMARY KEY (ticker, date)
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    ticker TEXT NOT NULL,
+    resolution TEXT NOT NULL,
+    date TEXT NOT NULL,
+    high REAL, low REAL, open REAL, close REAL, volume REAL, adj_close REAL,
+    PRIMARY KEY (ticker, resolution, date)
+);
+CREATE TABLE IF NOT EXISTS covered (
+    ticker TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (ticker, start, end)
+);
+"""
+
+
+def to_date(value) -> datetime.date:
+    """Normalize a date, datetime or 'YYYY-MM-DD' string to a date"""
+    return pd.Timestamp(value).date()
+
+
+def _day_end(date: datetime.date) -> float:
+    """Timestamp of the local midnight ending `date`"""
+    return datetime.datetime.combine(date + datetime.timedelta(days=1),
+                                     datetime.time()).timestamp()
+
+
+class HistCache:
+    """SQLite-backed store of daily bars.
+    For every ticker the cache keeps the disjoint date ranges already fetched. A request only
+    fetches the gaps between them, and the ranges that touch or overlap are merged. A fetch
+    that returned no bars is only remembered for `empty_ttl` seconds, so a transient empty
+    answer is retried later. Today's bar is considered stale after `today_ttl` seconds, so
+    intraday data keeps refreshing, and a range last refreshed before its final day ended
+    fetches that day again, since crypto markets never close and its bar was partial.
+    Weekly and monthly rollups of the bars are stored in the same database. Storing bars
+    only recomputes the rollup periods they fall in."""
+
+    def __init__(self, path: str, today_ttl: float = 300, empty_ttl: float = 86400) -> None:
+        ensure_parent_dir(path)
+        self.today_ttl = today_ttl
+        self.empty_ttl = empty_ttl
+        self.metrics = get_metrics()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def _ranges(self, ticker):
+        """(start, end, refreshed_at) of the covered ranges that have not expired, by start"""
+        rows = self._conn.execute(
+            "SELECT start, end, refreshed_at FROM covered "
+            "WHERE ticker = ? AND (expires_at = 0 OR expires_at > ?) ORDER BY start",
+            (ticker, time.time())).fetchall()
+        return [(to_date(start), to_date(end), refreshed_at) for start, end, refreshed_at in rows]
+
+    def missing_ranges(self, ticker: str, start: datetime.date, end: datetime.date) -> list:
+        """Sub-ranges of [start, end] that have to be fetched from the upstream source"""
+        today = datetime.date.today()
+        end = min(end, today)
+        if start > end:
+            return []
+        with self._lock:
+            ranges = self._ranges(ticker)
+
+        one_day = datetime.timedelta(days=1)
+        missing = []
+        cursor = start
+        today_refreshed_at = None
+        for cov_start, cov_end, refreshed_at in ranges:
+            if refreshed_at and cov_end < today and refreshed_at < _day_end(cov_end):
+                # the last bar was fetched while its day was still trading
+                cov_end -= one_day
+                if cov_end < cov_start:
+                    continue
+            if cov_start <= today <= cov_end:
+                today_refreshed_at = max(refreshed_at, today_refreshed_at or 0)
+            if cov_end < cursor or cov_start > end:
+                continue
+            if cov_start > cursor:
+                missing.append((cursor, cov_start - one_day))
+            cursor = max(cursor, cov_end + one_day)
+        if cursor <= end:
+            missing.append((cursor, end))
+        elif end == today and time.time() - today_refreshed_at > self.today_ttl:
+            missing.append((today, end))
+        return missing
+
+    def store(self, ticker: str, table: pd.DataFrame, start: datetime.date, end: datetime.date):
+        """Merge fetched bars into the store and mark [start, end] as covered. A range that
+        came back empty is only covered for `empty_ttl` seconds (`today_ttl` if it ends
+        today)."""
+        rows = []
+        if not table.empty:
+            values = table.reindex(columns=FIELDS)
+            for date, row in zip(values.index, values.itertuples(index=False)):
+                rows.append((ticker, to_date(date).isoformat(), *row))
+
+        # never mark future days as covered, they have to be fetched once they exist
+        today = datetime.date.today()
+        end = min(end, today)
+        now = time.time()
+        refreshed_at = now if end == today else 0
+        stored = (start, end)
+        one_day = datetime.timedelta(days=1)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO bars (ticker, date, {', '.join(_COLUMNS)}) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.execute("DELETE FROM covered WHERE ticker = ? AND expires_at != 0 "
+                               "AND expires_at <= ?", (ticker, now))
+            if not rows:
+                ttl = self.today_ttl if end == today else self.empty_ttl
+                self._conn.execute("INSERT OR REPLACE INTO covered VALUES (?, ?, ?, ?, ?)",
+                                   (ticker, start.isoformat(), end.isoformat(), now, now + ttl))
+                return
+
+            # merged with the ranges it overlaps or touches; the refresh time is the one of
+            # the range ending last, the freshly stored one on a tie
+            for cov_start, cov_end, cov_refreshed_at in self._conn.execute(
+                    "SELECT start, end, refreshed_at FROM covered WHERE ticker = ? "
+                    "AND expires_at = 0 AND start <= ? AND end >= ?",
+                    (ticker, (end + one_day).isoformat(), (start - one_day).isoformat())
+            ).fetchall():
+                start = min(start, to_date(cov_start))
+                if to_date(cov_end) > end:
+                    end, refreshed_at = to_date(cov_end), cov_refreshed_at
+            self._conn.execute("DELETE FROM covered WHERE ticker = ? AND start >= ? AND end <= ?",
+                               (ticker, start.isoformat(), end.isoformat()))
+            self._conn.execute("INSERT INTO covered VALUES (?, ?, ?, ?, 0)",
+                               (ticker, start.isoformat(), end.isoformat(), refreshed_at))
+        self.update_rollups(ticker, *stored)
+
+    def update_rollups(self, ticker: str, start: datetime.date, end: datetime.date) -> None:
+        """Recompute the rollup periods overlapping [start, end] from the stored bars"""
+        for resolution in ROLLUPS:
+            first, last = period_bounds(start, end, resolution)
+            rollup = resample_ohlcv(self.load(ticker, first, last), resolution)
+            rows = [(ticker, resolution, date.date().isoformat(), *row)
+                    for date, row in zip(rollup.index, rollup.itertuples(index=False))]
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO rollups (ticker, resolution, date, "
+                    f"{', '.join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def load_rollup(self, ticker: str, resolution: str, start: datetime.date,
+                    end: datetime.date) -> pd.DataFrame:
+        """Stored `resolution` bars of the periods overlapping [start, end]"""
+        first, _ = period_bounds(start, end, resolution)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, {', '.join(_COLUMNS)} FROM rollups "
+                f"WHERE ticker = ? AND resolution = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (ticker, resolution, first.isoformat(), end.isoformat())).fetchall()
+
+        return pd.DataFrame([row[1:] for row in rows], columns=FIELDS,
+                            index=pd.DatetimeIndex([row[0] for row in rows], name="Date"))
+
+    def load(self, ticker: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, {', '.join(_COLUMNS)} FROM bars "
+                f"WHERE ticker = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (ticker, start.isoformat(), end.isoformat())).fetchall()
+
+        table = pd.DataFrame([row[1:] for row in rows], columns=FIELDS,
+                             index=pd.DatetimeIndex([row[0] for row in rows], name="Date"))
+        return table
+
+    def get(self, ticker: str, start_date, end_date, fetch, resolution="day") -> pd.DataFrame:
+        """Return the bars of `ticker` between `start_date` and `end_date` (inclusive), daily
+        or rolled up to one of ROLLUPS.
+        `fetch(ticker, start, end)` is called only for the missing sub-ranges."""
+        start, end = to_date(start_date), to_date(end_date)
+        missing = self.missing_ranges(ticker, start, end)
+        self.metrics.incr("cache.miss" if missing else "cache.hit", cache="hist")
+        for missing_start, missing_end in missing:
+            table = fetch(ticker, missing_start, missing_end)
+            self.store(ticker, table, missing_start, missing_end)
+
+        with self.metrics.span("cache.load", resolution=resolution):
+            if resolution == "day":
+                return self.load(ticker, start, end)
+            return self.load_rollup(ticker, resolution, start, end)
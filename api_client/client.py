@@ -1,44 +1,209 @@
 """Polygon.io API client"""
 
+import concurrent.futures
+import configparser
 import datetime
 import os
+import threading
 
-import requests
 import requests.exceptions
 
-import pandas_datareader.data as web
+from api_client.cache import HistCache
+from api_client.metrics import get_metrics
+from api_client.panel import Panel
+from api_client.resample import RESOLUTIONS, choose_resolution
+from api_client.snapshot import TickerSnapshot
+from api_client.sources import build_source
+from api_client.tickers import TickerRegistry
+from api_client.transport import conditional_headers, get_transport, validators
 
 
 class Client:
     BASE_URL = "https://api.polygon.io"
     TICKERS = "/v3/reference/tickers?market=crypto&active=true&sort=ticker&order=asc&limit=1000"
+    SNAPSHOT = "/v2/snapshot/locale/global/markets/crypto/tickers"
+    # number of tickers requested per snapshot call
+    SNAPSHOT_BATCH = 100
 
     def __init__(self) -> None:
-        _api_key = os.environ["Polygon_API_Key"]
-        self.headers = {"Authorization": f"Bearer {_api_key}"}
+        # without a key the Polygon requests are still made (e.g. against a local stand-in),
+        # the real service answers them with 401 and the Yahoo source takes over
+        _api_key = os.environ.get("Polygon_API_Key")
+        self.headers = {"Authorization": f"Bearer {_api_key}"} if _api_key else {}
 
-        self.tickers = self._load_tickers()
+        self.metrics = get_metrics()
+        config = configparser.ConfigParser()
+        config.read("config.ini")
+        self.base_url = config["client"].get("base_url", self.BASE_URL)
+        self.cache = HistCache(config["cache"]["path"],
+                               today_ttl=config["cache"].getfloat("today_ttl"),
+                               empty_ttl=config["cache"].getfloat("empty_ttl"))
+        self.max_workers = config["client"].getint("max_workers")
+        self.min_bars_per_pixel = config["rollups"].getfloat("min_bars_per_pixel")
+        self.chart_width = config["rollups"].getint("chart_width")
+        self.hourly = config["rollups"].getboolean("hourly")
+        self.transport = get_transport()
+        self.source = build_source(self, config["data"]["backends"],
+                                   config["data"].get("yahoo_url", ""))
 
-    def _load_tickers(self) -> list:
-        url = self.BASE_URL + self.TICKERS
-        try:
-            r = requests.get(url, headers=self.headers)
-            results = r.json()["results"]
-        except (requests.exceptions.ConnectionError, KeyError):
-            return []
+        self.snapshot = TickerSnapshot(config["tickers"]["snapshot"],
+                                       config["tickers"].getfloat("refresh_interval"))
+        pages = self.snapshot.load()
+        if pages is None:
+            pages = self._load_ticker_pages()
+            if pages:
+                self.snapshot.save(pages)
+        self._set_tickers(pages)
+        if self.snapshot.is_stale():
+            threading.Thread(target=self.refresh_tickers, daemon=True).start()
 
-        return results
+    def _set_tickers(self, pages):
+        self.ticker_pages = pages
+        self.tickers = [ticker for page in pages for ticker in page["results"]]
+        self.registry = TickerRegistry(self.tickers)
+
+    def iter_ticker_pages(self, known=()):
+        """Yield the pages of the ticker universe as they arrive, following the `next_url`
+        cursor until the last page. A page is a dict of its `url`, `results`, `next_url`
+        and the `validators` it was served with; a page of `known` that has not changed
+        since is revalidated with a 304 and yielded as it was."""
+        known = {page["url"]: page for page in known}
+        url = self.base_url + self.TICKERS
+        while url:
+            stored = known.get(url)
+            headers = dict(self.headers)
+            if stored is not None:
+                headers.update(conditional_headers(stored["validators"]))
+            r = self.transport.get(url, headers=headers, revalidate=False)
+            if r.status_code == 304 and stored is not None:
+                self.metrics.incr("client.tickers_not_modified")
+                page = stored
+            else:
+                r.raise_for_status()
+                data = r.json()
+                page = {"url": url, "results": data["results"],
+                        "next_url": data.get("next_url"), "validators": validators(r)}
+            yield page
+            url = page["next_url"]
+
+    def _load_ticker_pages(self, known=()) -> list:
+        with self.metrics.span("client.load_tickers"):
+            try:
+                return list(self.iter_ticker_pages(known))
+            except (requests.exceptions.RequestException, KeyError, ValueError):
+                return []
+
+    def refresh_tickers(self) -> None:
+        """Download the ticker universe again, revalidating the stored pages, and replace the
+        stored snapshot with it"""
+        pages = self._load_ticker_pages(self.ticker_pages)
+        if pages:
+            self._set_tickers(pages)
+            self.snapshot.save(pages)
 
     def get_daily_open_close(self, ticker: str, date: datetime.date, adjusted):
         result = self.get_hist_data(ticker, date, date.strftime("%Y-%m-%d"))
+        if result.empty:
+            raise KeyError(date)
 
         if adjusted == "adjusted":
-            close = result.iloc[0, -1]
+            close = result["Adj Close"].iat[0]
         else:
-            close = result.iloc[0, -3]
+            close = result["Close"].iat[0]
         return close
 
-    def get_hist_data(self, ticker, start_date, end_date):
-        return web.DataReader(name=ticker, data_source='yahoo',
-                              start=start_date,
-                              end=end_date)
+    def get_last_prices(self, tickers) -> dict:
+        """Last traded price of each ticker, fetched with one snapshot call per
+        SNAPSHOT_BATCH tickers. Tickers without a snapshot are left out."""
+        by_polygon = {self.registry.to_polygon(ticker): ticker for ticker in tickers}
+        symbols = list(by_polygon)
+        prices = {}
+        for i in range(0, len(symbols), self.SNAPSHOT_BATCH):
+            r = self.transport.get(self.base_url + self.SNAPSHOT, headers=self.headers,
+                                   params={"tickers": ",".join(symbols[i:i + self.SNAPSHOT_BATCH])},
+                                   revalidate=False)
+            r.raise_for_status()
+            for snapshot in r.json()["tickers"]:
+                price = (snapshot.get("lastTrade") or {}).get("p") \
+                    or (snapshot.get("min") or {}).get("c") \
+                    or (snapshot.get("day") or {}).get("c")
+                if snapshot["ticker"] in by_polygon and price:
+                    prices[by_polygon[snapshot["ticker"]]] = price
+        return prices
+
+    def resolution_for(self, start_date, end_date, pixels=None) -> str:
+        """Coarsest resolution whose bars still fill `pixels` (by default [rollups]
+        chart_width) horizontal pixels over the range. Hourly bars are only considered
+        when [rollups] hourly is on."""
+        resolutions = RESOLUTIONS if self.hourly else RESOLUTIONS[1:]
+        return choose_resolution(start_date, end_date, pixels or self.chart_width,
+                                 self.min_bars_per_pixel, resolutions)
+
+    def get_hist_data(self, ticker, start_date, end_date, resolution="day"):
+        """Bars for `ticker` (in either notation) at one of RESOLUTIONS. Daily, weekly and
+        monthly bars are served from the local cache whenever possible; hourly bars come
+        straight from the data sources, which raise ValueError when none of them has any."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown resolution '{resolution}', expected one of {RESOLUTIONS}")
+        with self.metrics.span("client.get_hist_data", resolution=resolution):
+            if resolution == "hour":
+                return self.get_bars(ticker, start_date, end_date, "hour")
+            return self.cache.get(self.registry.to_yahoo(ticker), start_date, end_date,
+                                  self._fetch_hist_data, resolution)
+
+    def _fetch_many(self, tickers, start_date, end_date, resolution, max_workers=None,
+                    skipped=(KeyError, IOError)) -> dict:
+        """{ticker: bars} fetched concurrently by a bounded pool of workers. Tickers failing
+        with one of the `skipped` errors are left out, any other error is raised."""
+        tables = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers or self.max_workers) as pool:
+            futures = {ticker: pool.submit(self.get_hist_data, ticker, start_date, end_date,
+                                           resolution)
+                       for ticker in tickers}
+            for ticker, future in futures.items():
+                try:
+                    tables[ticker] = future.result()
+                except skipped as e:
+                    # IOError covers RequestException and pandas_datareader's RemoteDataError
+                    self.metrics.error("client.ticker_failed", e, ticker=ticker)
+        return tables
+
+    @staticmethod
+    def _to_panel(tables, dtype) -> Panel:
+        panel = Panel(dtype=dtype)
+        panel.extend({ticker: table for ticker, table in tables.items() if not table.empty})
+        return panel
+
+    def get_hist_data_many(self, tickers, start_date, end_date, max_workers=None,
+                           dtype="float64", resolution="day") -> Panel:
+        """Bars for several tickers, fetched concurrently by a bounded pool of workers.
+        Returns one Panel aligned on the union of the dates.
+        Tickers for which no data could be fetched are left out of the panel."""
+        return self._to_panel(self._fetch_many(tickers, start_date, end_date, resolution,
+                                               max_workers), dtype)
+
+    def get_chart_data(self, tickers, start_date, end_date, resolution="day",
+                       dtype="float64"):
+        """(resolution served, Panel) of `tickers` at `resolution`. If any of the tickers has
+        no hourly bars, the whole batch is served daily instead, so that a panel never mixes
+        resolutions."""
+        if resolution == "hour":
+            try:
+                tables = self._fetch_many(tickers, start_date, end_date, "hour", skipped=())
+                if all(not table.empty for table in tables.values()):
+                    return resolution, self._to_panel(tables, dtype)
+            except (KeyError, ValueError, IOError):
+                pass
+            self.metrics.incr("client.hourly_fallback")
+            resolution = "day"
+        return resolution, self.get_hist_data_many(tickers, start_date, end_date,
+                                                   dtype=dtype, resolution=resolution)
+
+    def get_bars(self, ticker, start_date, end_date, timespan="day", multiplier=1):
+        """Bars of `multiplier` minutes, hours or days for `ticker`, straight from the data
+        sources. Only the daily bars of `get_hist_data` go through the cache."""
+        return self.source.fetch(self.registry.info(ticker), start_date, end_date,
+                                 timespan, multiplier)
+
+    def _fetch_hist_data(self, ticker, start_date, end_date):
+        return self.source.fetch(self.registry.info(ticker), start_date, end_date)
@@ -1,8 +1,14 @@
 """Contains a Scraper objects that feed the list of crypto coins to the application"""
+import collections
 import configparser
 
-import requests
-from bs4 import BeautifulSoup
+from lxml import etree
+
+from api_client.metrics import get_metrics
+from api_client.transport import get_transport
+
+
+CoinRecord = collections.namedtuple("CoinRecord", ["name", "symbol", "rank", "price", "market_cap"])
 
 
 def extract_name(full_name: str, symbol: str) -> str:
@@ -12,6 +18,39 @@ def extract_name(full_name: str, symbol: str) -> str:
     return full_name[len(symbol):]
 
 
+def parse_number(text: str):
+    """Parse a '$1,234.56'-style cell, None if the cell holds no number"""
+    try:
+        return float(text.replace("$", "").replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def parse_coins(chunks):
+    """Incrementally parse the table rows of the coin listing page.
+    `chunks` is an iterable of bytes (e.g. the body of a streamed response); the rows are
+    yielded as CoinRecords while the page is still being fed to the parser. Each row is
+    dropped from the tree once it has been read, so the whole DOM is never held in memory."""
+    parser = etree.HTMLPullParser(events=("end",), tag="tr")
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, row in parser.read_events():
+            if row.getparent() is not None and row.getparent().tag == "tbody":
+                cells = ["".join(cell.itertext()) for cell in row.iterchildren("td")]
+                if len(cells) >= 5:
+                    rank = cells[0].strip()
+                    yield CoinRecord(name=extract_name(cells[1], cells[2]),
+                                     symbol=cells[2],
+                                     rank=int(rank) if rank.isdigit() else None,
+                                     price=parse_number(cells[4]),
+                                     market_cap=parse_number(cells[3]))
+
+            row.clear()
+            while row.getprevious() is not None:
+                del row.getparent()[0]
+    parser.close()
+
+
 class Scraper:
 
     def __init__(self):
@@ -19,26 +58,15 @@ class Scraper:
         config.read("config.ini")
         self.url = config["scraper"]["url"]
 
-        self.soup = BeautifulSoup(self._get_html_text(), 'lxml')
+    def _iter_html_chunks(self, chunk_size=64 * 1024):
+        r = get_transport().get(self.url, stream=True)
 
-    def _get_html_text(self):
-        r = requests.get(self.url)
+        return r.iter_content(chunk_size)
 
-        return r.text
+    def iter_coins(self):
+        """Yield a CoinRecord per listed coin while the page is being downloaded"""
+        return parse_coins(self._iter_html_chunks())
 
     def scrape_coin_names(self) -> list:
-        result = []
-        table = self.soup.find("tbody")
-        rows = table.find_all("tr")
-        for row in rows:
-            cells = row.find_all("td")
-            full_name = cells[1].text
-            symbol_str = cells[2].text
-            name = extract_name(full_name, symbol_str)
-            result.append(name)
-
-        return result
-
-
-
-
+        with get_metrics().span("scraper.scrape_coin_names"):
+            return [coin.name for coin in self.iter_coins()]
@@ -0,0 +1,202 @@
+"""Chunked export of historical data tables to files.
+Every writer streams the table in blocks of rows, so progress can be reported while the file
+is being written. Given a LazyTable, only one block of rows is built at a time, so memory use
+does not depend on the size of the export."""
+
+import html
+import json
+import threading
+
+import pandas as pd
+
+
+FORMATS = ["csv", "xlsx", "json", "html", "parquet", "feather"]
+
+
+def _flat_columns(table: pd.DataFrame) -> list:
+    """'TICKER Field' column names for formats without multi-level headers"""
+    if isinstance(table.columns, pd.MultiIndex):
+        return [" ".join(str(level) for level in column) for column in table.columns]
+    return [str(column) for column in table.columns]
+
+
+class LazyTable:
+    """A table of `n_rows` rows built block by block by `frame(rows)`, with `rows` a slice
+    (e.g. Panel.to_frame). The source must not change while the table is being read."""
+
+    def __init__(self, frame, n_rows: int) -> None:
+        self.frame = frame
+        self.n_rows = n_rows
+        self.columns = frame(slice(0, 0)).columns
+
+    def __len__(self):
+        return self.n_rows
+
+
+def _chunks(table, chunk_rows: int):
+    # an empty table still yields one empty block, so that every format writes its header
+    for start in range(0, max(len(table), 1), chunk_rows):
+        if isinstance(table, LazyTable):
+            yield table.frame(slice(start, start + chunk_rows))
+        else:
+            yield table.iloc[start:start + chunk_rows]
+
+
+def _write_csv(table, path, chunk_rows, progress):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for i, chunk in enumerate(_chunks(table, chunk_rows)):
+            chunk.to_csv(f, header=i == 0)
+            progress(len(chunk))
+
+
+def _write_xlsx(table, path, chunk_rows, progress):
+    import openpyxl
+
+    # write-only workbooks stream rows to disk instead of keeping every cell object around
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["Date"] + _flat_columns(table))
+    for chunk in _chunks(table, chunk_rows):
+        values = chunk.to_numpy(dtype=object, copy=True)
+        values[pd.isna(values)] = None
+        for date, row in zip(chunk.index.to_pydatetime(), values.tolist()):
+            sheet.append([date] + row)
+        progress(len(chunk))
+    workbook.save(path)
+
+
+def _write_json(table, path, chunk_rows, progress):
+    # same layout as DataFrame.to_json(orient="split"), written one block of rows at a time:
+    # the dates first, then the rows of values
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"columns":' + json.dumps(_flat_columns(table)) + ',"index":[')
+        for i, chunk in enumerate(_chunks(table, chunk_rows)):
+            dates = pd.Series(chunk.index).to_json(orient="values", date_format="iso")
+            f.write(("," if i else "") + dates[1:-1])
+        f.write('],"data":[')
+        for i, chunk in enumerate(_chunks(table, chunk_rows)):
+            rows = chunk.to_json(orient="values")
+            f.write(("," if i else "") + rows[1:-1])
+            progress(len(chunk))
+        f.write("]}")
+
+
+def _write_html(table, path, chunk_rows, progress):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('<table border="1" class="dataframe">\n<thead><tr><th>Date</th>')
+        f.write("".join(f"<th>{html.escape(column)}</th>" for column in _flat_columns(table)))
+        f.write("</tr></thead>\n<tbody>\n")
+        with_time = None
+        for chunk in _chunks(table, chunk_rows):
+            if with_time is None:
+                # intraday bars keep their time, daily ones are shown as plain dates
+                with_time = bool((chunk.index != chunk.index.normalize()).any())
+            dates = chunk.index.strftime("%Y-%m-%d %H:%M:%S" if with_time else "%Y-%m-%d")
+            values = chunk.to_numpy()
+            lines = ["<tr><th>" + date + "</th>" + "".join(f"<td>{value}</td>" for value in row)
+                     + "</tr>\n" for date, row in zip(dates, values.tolist())]
+            f.write("".join(lines))
+            progress(len(chunk))
+        f.write("</tbody>\n</table>\n")
+
+
+def _arrow_batches(table, chunk_rows, progress):
+    import pyarrow as pa
+
+    columns = _flat_columns(table)
+    for chunk in _chunks(table, chunk_rows):
+        arrays = [pa.array(chunk.index.to_numpy())]
+        arrays += [pa.array(chunk.iloc[:, i].to_numpy(), from_pandas=True)
+                   for i in range(chunk.shape[1])]
+        yield pa.RecordBatch.from_arrays(arrays, names=["Date"] + columns)
+        progress(len(chunk))
+
+
+def _write_parquet(table, path, chunk_rows, progress):
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for batch in _arrow_batches(table, chunk_rows, progress):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _write_feather(table, path, chunk_rows, progress):
+    import pyarrow as pa
+
+    # Feather v2 is the Arrow IPC file format
+    writer = None
+    try:
+        for batch in _arrow_batches(table, chunk_rows, progress):
+            if writer is None:
+                writer = pa.ipc.new_file(path, batch.schema)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {
+    "csv": _write_csv,
+    "xlsx": _write_xlsx,
+    "json": _write_json,
+    "html": _write_html,
+    "parquet": _write_parquet,
+    "feather": _write_feather,
+}
+
+
+def export_table(table: pd.DataFrame, path: str, exp_format: str, chunk_rows=5000,
+                 progress=None) -> None:
+    """Write `table` to `path` in `exp_format`, calling `progress(rows_written)` after
+    each chunk"""
+    if exp_format not in WRITERS:
+        raise ValueError(f"Export format '{exp_format}' not recognized")
+    rows_written = 0
+
+    def on_chunk(rows):
+        nonlocal rows_written
+        rows_written += rows
+        if progress is not None:
+            progress(rows_written)
+
+    WRITERS[exp_format](table, path, chunk_rows, on_chunk)
+
+
+class ExportJob:
+    """Runs an export on a background thread. `rows_written`, `done` and `error` can be
+    polled from the GUI thread to report progress."""
+
+    def __init__(self, table, path: str, exp_format: str, chunk_rows=5000):
+        self.table = table
+        self.path = path
+        self.exp_format = exp_format
+        self.chunk_rows = chunk_rows
+        self.total_rows = len(table)
+        self.rows_written = 0
+        self.done = False
+        self.error = None
+
+    def _run(self):
+        try:
+            export_table(self.table, self.path, self.exp_format, self.chunk_rows,
+                         progress=self._on_progress)
+        except Exception as e:
+            self.error = e
+        self.done = True
+
+    def _on_progress(self, rows_written):
+        self.rows_written = rows_written
+
+    def start(self) -> "ExportJob":
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    @property
+    def fraction(self) -> float:
+        return self.rows_written / self.total_rows if self.total_rows else 1.0
@@ -0,0 +1,20 @@
+"""Helpers for the files written by the api_client package"""
+
+import json
+import os
+
+
+def ensure_parent_dir(path: str) -> None:
+    """Create the directory `path` lives in, if there is one and it does not exist yet"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+def write_json_atomic(path: str, data, **dump_kwargs) -> None:
+    """Write `data` as JSON to `path`. The file is written under a temporary name first and
+    then moved over `path`, so that a crash never leaves a truncated file behind."""
+    ensure_parent_dir(path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_kwargs)
+    os.replace(tmp_path, path)
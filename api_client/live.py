@@ -0,0 +1,68 @@
+"""Live spot price polling for a watchlist of tickers"""
+
+import threading
+
+import requests.exceptions
+
+from api_client.metrics import get_metrics
+
+
+class QuotePoller:
+    """Polls the last prices of a watchlist every `interval` seconds on a single background
+    thread. Each round fetches the whole watchlist in as few upstream calls as the client
+    allows, keeps the last known price per ticker and passes only the rows that changed to
+    `on_changes(changes: dict)`. The callback runs on the polling thread."""
+
+    def __init__(self, client, interval: float, on_changes) -> None:
+        self.client = client
+        self.interval = interval
+        self.on_changes = on_changes
+        self.prices = {}
+        self.metrics = get_metrics()
+
+        self._watchlist = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, tickers) -> None:
+        with self._lock:
+            self._watchlist = list(dict.fromkeys(self._watchlist + list(tickers)))
+
+    def poll_once(self) -> dict:
+        with self._lock:
+            watchlist = list(self._watchlist)
+        if not watchlist:
+            return {}
+
+        try:
+            latest = self.client.get_last_prices(watchlist)
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            self.metrics.error("live.poll_failed", e)
+            return {}
+
+        changes = {ticker: price for ticker, price in latest.items()
+                   if self.prices.get(ticker) != price}
+        self.prices.update(changes)
+        return changes
+
+    def _run(self):
+        while not self._stop.is_set():
+            changes = self.poll_once()
+            if changes:
+                self.on_changes(changes)
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
@@ -0,0 +1,219 @@
+"""In-process instrumentation: timing spans, counters and in-flight gauges.
+Switched on and off by the [metrics] section of config.ini. When it is off every probe is a
+no-op costing one attribute check, so the probes can stay on the hot paths. When it is on,
+finished spans are kept in a bounded history (read by the GUI debug overlay), aggregated
+per name, optionally written to a rotating log file as JSON lines, and the aggregates are
+dumped as Prometheus text or JSON when the process exits."""
+
+import atexit
+import collections
+import configparser
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+
+from api_client.files import ensure_parent_dir
+
+Span = collections.namedtuple("Span", ["name", "labels", "seconds", "ended_at", "error"])
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+class _NullProbe:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_PROBE = _NullProbe()
+
+
+class _SpanProbe:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics, name, labels) -> None:
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._record(self.name, self.labels, time.perf_counter() - self.start,
+                             exc_type is not None)
+        return False
+
+
+class _GaugeProbe:
+    __slots__ = ("metrics", "key")
+
+    def __init__(self, metrics, key) -> None:
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.metrics._move_gauge(self.key, 1)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics._move_gauge(self.key, -1)
+        return False
+
+
+class Metrics:
+
+    def __init__(self, enabled=False, history=200, logger=None) -> None:
+        self.enabled = enabled
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._history = collections.deque(maxlen=history)
+        self._spans = {}  # (name, labels) -> [count, total seconds, max seconds, errors]
+        self._counters = collections.Counter()
+        self._gauges = {}
+
+    def span(self, name, **labels):
+        """Context manager timing the code it wraps"""
+        if not self.enabled:
+            return _NULL_PROBE
+        return _SpanProbe(self, name, labels)
+
+    def observe(self, name, seconds, **labels) -> None:
+        """Record a duration measured elsewhere as a finished span"""
+        if self.enabled:
+            self._record(name, labels, seconds, False)
+
+    def incr(self, name, value=1, **labels) -> None:
+        if self.enabled:
+            with self._lock:
+                self._counters[_key(name, labels)] += value
+
+    def error(self, name, error, **labels) -> None:
+        """Count an error that was handled under `name`, and log it if a log file is set"""
+        if self.enabled:
+            self.incr(name, **labels)
+            if self.logger is not None:
+                self.logger.warning(json.dumps({"error": name, **labels,
+                                                "type": type(error).__name__,
+                                                "message": str(error)}))
+
+    def in_flight(self, name, **labels):
+        """Context manager counting the code paths currently inside it"""
+        if not self.enabled:
+            return _NULL_PROBE
+        return _GaugeProbe(self, _key(name, labels))
+
+    def _move_gauge(self, key, delta):
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def _record(self, name, labels, seconds, error):
+        span = Span(name, labels, seconds, time.time(), error)
+        key = _key(name, labels)
+        with self._lock:
+            self._history.append(span)
+            stats = self._spans.get(key)
+            if stats is None:
+                stats = self._spans[key] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += error
+        if self.logger is not None:
+            self.logger.info(json.dumps({"span": name, **labels, "ms": round(seconds * 1000, 3),
+                                         "error": error}))
+
+    def recent(self, n=20) -> list:
+        """The last `n` finished spans, newest first"""
+        with self._lock:
+            history = list(self._history)
+        return history[:-n - 1:-1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            spans = {key: list(stats) for key, stats in self._spans.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        return {
+            "spans": [{"name": name, "labels": dict(labels), "count": count,
+                       "total_s": total, "max_s": longest, "errors": errors}
+                      for (name, labels), (count, total, longest, errors) in spans.items()],
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in counters.items()],
+            "gauges": [{"name": name, "labels": dict(labels), "value": value}
+                       for (name, labels), value in gauges.items()],
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """The aggregates in the Prometheus text exposition format"""
+        def metric(name, labels, suffix=""):
+            name = "cryptoapp_" + name.replace(".", "_") + suffix
+            if not labels:
+                return name
+            return name + "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+        snapshot = self.snapshot()
+        lines = []
+        for span in snapshot["spans"]:
+            lines.append(f"{metric(span['name'], span['labels'], '_seconds_count')} "
+                         f"{span['count']}")
+            lines.append(f"{metric(span['name'], span['labels'], '_seconds_sum')} "
+                         f"{span['total_s']:.6f}")
+            lines.append(f"{metric(span['name'], span['labels'], '_seconds_max')} "
+                         f"{span['max_s']:.6f}")
+            lines.append(f"{metric(span['name'], span['labels'], '_errors_total')} "
+                         f"{span['errors']}")
+        for counter in snapshot["counters"]:
+            lines.append(f"{metric(counter['name'], counter['labels'], '_total')} "
+                         f"{counter['value']}")
+        for gauge in snapshot["gauges"]:
+            lines.append(f"{metric(gauge['name'], gauge['labels'])} {gauge['value']}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path) -> None:
+        """Write the aggregates to `path`, as JSON for a .json file, Prometheus text otherwise"""
+        ensure_parent_dir(path)
+        with open(path, "w") as f:
+            f.write(self.to_json() if path.endswith(".json") else self.to_prometheus())
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics() -> Metrics:
+    """The process-wide metrics, configured from the [metrics] section of config.ini"""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            config = configparser.ConfigParser()
+            config.read("config.ini")
+            metrics_config = config["metrics"]
+            enabled = metrics_config.getboolean("enabled")
+            logger = None
+            if enabled and metrics_config["log"]:
+                path = metrics_config["log"]
+                ensure_parent_dir(path)
+                handler = logging.handlers.RotatingFileHandler(
+                    path, maxBytes=metrics_config.getint("log_max_bytes"),
+                    backupCount=metrics_config.getint("log_backups"))
+                handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+                logger = logging.getLogger("cryptoapp.metrics")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                logger.addHandler(handler)
+            _metrics = Metrics(enabled, metrics_config.getint("history"), logger)
+            if enabled and metrics_config["dump"]:
+                atexit.register(_metrics.dump, os.path.abspath(metrics_config["dump"]))
+    return _metrics
@@ -0,0 +1,71 @@
+"""Google News search with a per-query TTL cache"""
+
+import concurrent.futures
+import threading
+import time
+
+from api_client.metrics import get_metrics
+
+
+class NewsService:
+    """Searches Google News on a pool of worker threads.
+    Results are cached per query for `ttl` seconds, and concurrent searches for the same
+    query share one in-flight request. GoogleNews instances keep the results of the last
+    search as state, so every search uses an instance of its own."""
+
+    def __init__(self, ttl: float = 600, max_workers: int = 4, period="7d", lang="en") -> None:
+        self.ttl = ttl
+        self.period = period
+        self.lang = lang
+        self._cache = {}  # query -> (fetched_at, results)
+        self._in_flight = {}  # query -> future of the running search
+        self._lock = threading.Lock()
+        self.metrics = get_metrics()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers,
+                                                               thread_name_prefix="news")
+
+    def _fetch(self, query):
+        # GoogleNews pulls in dateparser, which takes longer to import than the rest of the app
+        from GoogleNews import GoogleNews
+
+        try:
+            with self.metrics.in_flight("news.in_flight"), self.metrics.span("news.search"):
+                google_news = GoogleNews(period=self.period, lang=self.lang, encode="utf-8")
+                google_news.search(query)
+                results = google_news.result()
+            with self._lock:
+                self._cache[query] = (time.monotonic(), results)
+        finally:
+            with self._lock:
+                del self._in_flight[query]
+        return results
+
+    def cached(self, query):
+        """Fresh cached results for `query`, or None"""
+        with self._lock:
+            entry = self._cache.get(query)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.metrics.incr("cache.miss", cache="news")
+            return None
+        self.metrics.incr("cache.hit", cache="news")
+        return entry[1]
+
+    def submit(self, query, use_cache=True) -> concurrent.futures.Future:
+        """Future of the results for `query`, joining an identical search still running.
+        Without `use_cache`, cached results are ignored and the search runs again."""
+        results = self.cached(query) if use_cache else None
+        if results is not None:
+            future = concurrent.futures.Future()
+            future.set_result(results)
+            return future
+
+        with self._lock:
+            future = self._in_flight.get(query)
+            if future is None:
+                future = self._executor.submit(self._fetch, query)
+                self._in_flight[query] = future
+        return future
+
+    def prefetch(self, queries) -> list:
+        """Start searching all `queries` in parallel, so they are served from the cache later"""
+        return [self.submit(query) for query in queries]
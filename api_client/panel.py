@@ -0,0 +1,98 @@
+"""Columnar multi-ticker panel of daily bars aligned on a shared date index"""
+
+import numpy as np
+import pandas as pd
+
+from api_client.cache import FIELDS
+
+
+class Panel:
+    """Per-field 2D arrays of shape (dates, tickers) sharing one date index.
+    Ticker columns are allocated with spare capacity that grows geometrically, so adding a
+    ticker only writes its own column. The arrays are copied only when the capacity runs out
+    or when a new ticker brings dates the index does not have yet."""
+
+    def __init__(self, fields=FIELDS, dtype=np.float64) -> None:
+        self.fields = list(fields)
+        self.dtype = np.dtype(dtype)
+        self.index = pd.DatetimeIndex([], name="Date")
+        self.tickers = []
+        self._positions = {}
+        self._data = {field: np.empty((0, 0), dtype=self.dtype) for field in self.fields}
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._positions
+
+    @property
+    def empty(self) -> bool:
+        return not self.tickers or self.index.empty
+
+    def _reserve(self, index, n_columns):
+        """Make room for `n_columns` tickers on `index`, reallocating only when needed"""
+        rows, capacity = self._data[self.fields[0]].shape
+        if index.equals(self.index) and n_columns <= capacity:
+            return
+
+        new_capacity = max(n_columns, capacity)
+        if n_columns > capacity:
+            new_capacity = max(n_columns, 2 * capacity, 4)
+        rows_from = self.index.get_indexer(index) if len(self.index) else np.full(len(index), -1)
+        found = rows_from >= 0
+        for field in self.fields:
+            data = np.full((len(index), new_capacity), np.nan, dtype=self.dtype)
+            data[found, :capacity] = self._data[field][rows_from[found]]
+            self._data[field] = data
+        self.index = index
+
+    def extend(self, tables: dict) -> None:
+        """Add or replace tickers from a {ticker: DataFrame of fields} mapping"""
+        index = self.index
+        for table in tables.values():
+            index = index.union(pd.DatetimeIndex(table.index))
+        index.name = "Date"
+        new = [ticker for ticker in tables if ticker not in self._positions]
+        self._reserve(index, len(self.tickers) + len(new))
+
+        for ticker in new:
+            self._positions[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        for ticker, table in tables.items():
+            column = self._positions[ticker]
+            rows = self.index.get_indexer(pd.DatetimeIndex(table.index))
+            for field in self.fields:
+                self._data[field][:, column] = np.nan
+                if field in table:
+                    self._data[field][rows, column] = table[field].to_numpy(dtype=self.dtype)
+
+    def add(self, ticker, table: pd.DataFrame) -> None:
+        self.extend({ticker: table})
+
+    def merge(self, other: "Panel") -> None:
+        self.extend({ticker: other.frame(ticker) for ticker in other.tickers})
+
+    def values(self, field) -> np.ndarray:
+        """(dates, tickers) array of `field`, a view on the storage"""
+        return self._data[field][:, :len(self.tickers)]
+
+    def series(self, field, ticker) -> np.ndarray:
+        return self._data[field][:, self._positions[ticker]]
+
+    def field(self, field) -> pd.DataFrame:
+        return pd.DataFrame(self.values(field), index=self.index, columns=self.tickers)
+
+    def frame(self, ticker) -> pd.DataFrame:
+        column = self._positions[ticker]
+        return pd.DataFrame({field: self._data[field][:, column] for field in self.fields},
+                            index=self.index)
+
+    def to_frame(self, rows=slice(None)) -> pd.DataFrame:
+        """The panel (or the `rows` slice of its dates) as a DataFrame with (ticker, field)
+        columns"""
+        columns = pd.MultiIndex.from_product([self.tickers, self.fields], names=["Ticker", "Field"])
+        index = self.index[rows]
+        values = np.stack([self.values(field)[rows] for field in self.fields], axis=2)
+        return pd.DataFrame(values.reshape(len(index), len(columns)), index=index,
+                            columns=columns)
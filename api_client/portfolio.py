@@ -0,0 +1,269 @@
+"""Crypto holdings recorded as transaction lots, and their valuation.
+The lots are persisted in a versioned JSON file. Positions, P&L and allocation are numpy
+arrays over the positions (and over the dates x tickers of a Panel for their history), so a
+portfolio of any size is revalued with a handful of vectorized operations."""
+
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import requests.exceptions
+
+from api_client.cache import to_date
+from api_client.files import write_json_atomic
+from api_client.metrics import get_metrics
+
+# quantities below this are treated as a closed position (float residue of partial sales)
+EPSILON = 1e-12
+
+
+class Lot:
+    """One transaction: a positive `quantity` is a purchase, a negative one a sale, of
+    `quantity` units of `ticker` at `price` each, plus `fee`"""
+    __slots__ = ("ticker", "quantity", "price", "date", "fee")
+
+    def __init__(self, ticker, quantity, price, date, fee=0.0) -> None:
+        self.ticker = ticker.upper()
+        self.quantity = float(quantity)
+        self.price = float(price)
+        self.date = to_date(date)
+        self.fee = float(fee)
+
+    @property
+    def cash_flow(self) -> float:
+        """Money put into the portfolio by the transaction, negative for the proceeds of a sale"""
+        return self.quantity * self.price + self.fee
+
+    def to_dict(self) -> dict:
+        return {"ticker": self.ticker, "quantity": self.quantity, "price": self.price,
+                "date": self.date.isoformat(), "fee": self.fee}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Lot":
+        return cls(data["ticker"], data["quantity"], data["price"], data["date"],
+                   data.get("fee", 0.0))
+
+    def __repr__(self):
+        return f"Lot({self.ticker!r}, {self.quantity!r}, {self.price!r}, {self.date!r})"
+
+
+class Portfolio:
+    """Transaction lots kept in date order and stored at `path`. With a TickerRegistry,
+    new lots are recorded in its Yahoo notation and unknown tickers are rejected."""
+    # bump whenever the layout of the stored lots changes
+    VERSION = 1
+
+    def __init__(self, path: str, registry=None) -> None:
+        self.path = path
+        self.registry = registry
+        self.lots = []
+
+    def load(self) -> "Portfolio":
+        """Read the stored lots; a missing file is an empty portfolio. A file that cannot be
+        read raises ValueError rather than being overwritten by the next save."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return self
+        if data.get("version") != self.VERSION:
+            raise ValueError(f"Unsupported portfolio version {data.get('version')!r} "
+                             f"in {self.path}")
+
+        self.lots = sorted((Lot.from_dict(lot) for lot in data["lots"]),
+                           key=lambda lot: lot.date)
+        return self
+
+    def save(self) -> None:
+        write_json_atomic(self.path, {"version": self.VERSION,
+                                      "lots": [lot.to_dict() for lot in self.lots]}, indent=1)
+
+    @property
+    def tickers(self) -> list:
+        return list(dict.fromkeys(lot.ticker for lot in self.lots))
+
+    def held(self, ticker: str, date=None) -> float:
+        """Quantity of `ticker` held at the end of `date` (of the last lot by default)"""
+        ticker = ticker.upper()
+        date = to_date(date) if date is not None else datetime.date.max
+        return sum(lot.quantity for lot in self.lots if lot.ticker == ticker and lot.date <= date)
+
+    def add(self, ticker, quantity, price, date=None, fee=0.0) -> Lot:
+        """Record a transaction; selling more than is held at that date, or an unknown
+        ticker, raises ValueError"""
+        ticker = ticker.strip()
+        if not ticker:
+            raise ValueError("A lot needs a ticker")
+        if self.registry is not None:
+            # an empty registry (the ticker list could not be loaded) only normalizes
+            if len(self.registry) and ticker not in self.registry:
+                raise ValueError(f"Unknown ticker '{ticker}'")
+            ticker = self.registry.to_yahoo(ticker)
+        lot = Lot(ticker, quantity, price, date or datetime.date.today(), fee)
+        if lot.quantity == 0 or lot.price < 0 or lot.fee < 0:
+            raise ValueError("A lot needs a non-zero quantity and a non-negative price and fee")
+        if lot.quantity < 0 and -lot.quantity > self.held(lot.ticker, lot.date) + EPSILON:
+            raise ValueError(f"Cannot sell {-lot.quantity} {lot.ticker}, "
+                             f"only {self.held(lot.ticker, lot.date)} held on {lot.date}")
+
+        # after the lots of the same day, so that the order of entry is kept
+        position = sum(1 for other in self.lots if other.date <= lot.date)
+        self.lots.insert(position, lot)
+        return lot
+
+    def remove(self, index: int) -> Lot:
+        return self.lots.pop(index)
+
+    def positions(self) -> pd.DataFrame:
+        """Quantity, remaining cost basis and realized P&L of every ticker ever traded.
+        Sales take their cost out of the position at its average cost."""
+        state = {}
+        for lot in self.lots:
+            quantity, cost, realized = state.get(lot.ticker, (0.0, 0.0, 0.0))
+            if lot.quantity > 0:
+                quantity, cost = quantity + lot.quantity, cost + lot.cash_flow
+            else:
+                sold_cost = cost * -lot.quantity / quantity if quantity > EPSILON else 0.0
+                realized += -lot.cash_flow - sold_cost
+                quantity, cost = quantity + lot.quantity, cost - sold_cost
+                if quantity < EPSILON:
+                    quantity, cost = 0.0, 0.0
+            state[lot.ticker] = (quantity, cost, realized)
+
+        return pd.DataFrame(list(state.values()), index=pd.Index(list(state), name="Ticker"),
+                            columns=["Quantity", "Cost", "Realized P&L"], dtype=np.float64)
+
+
+class Valuation:
+    """Market value, P&L and allocation of the positions of a portfolio.
+    Prices are kept in an array aligned with the positions. `update_prices` only touches the
+    rows whose price changed and moves the total value by the difference, so a live price
+    update costs as much as the number of changed positions."""
+    COLUMNS = ["Quantity", "Price", "Value", "Cost", "Unrealized P&L", "Realized P&L",
+               "Allocation"]
+
+    def __init__(self, portfolio: Portfolio) -> None:
+        self.portfolio = portfolio
+        self.metrics = get_metrics()
+        self.tickers = []
+        self.prices = np.empty(0)
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """Recompute the positions after the lots changed, keeping the known prices"""
+        known = dict(zip(self.tickers, self.prices))
+        positions = self.portfolio.positions()
+        self.tickers = list(positions.index)
+        self._rows = {ticker: row for row, ticker in enumerate(self.tickers)}
+        self.quantity = positions["Quantity"].to_numpy()
+        self.cost = positions["Cost"].to_numpy()
+        self.realized = positions["Realized P&L"].to_numpy()
+        self.prices = np.array([known.get(ticker, np.nan) for ticker in self.tickers],
+                               dtype=np.float64)
+        self.values = self.quantity * self.prices
+        self.total_value = np.nansum(self.values)
+
+    @property
+    def open_tickers(self) -> list:
+        """Tickers of the positions still held"""
+        return [ticker for ticker, quantity in zip(self.tickers, self.quantity) if quantity > 0]
+
+    def update_prices(self, prices: dict) -> list:
+        """Apply new `{ticker: price}` quotes; returns the tickers whose row changed"""
+        quotes = {ticker.upper(): price for ticker, price in prices.items()
+                  if ticker.upper() in self._rows}
+        if not quotes:
+            return []
+        changed = list(quotes)
+        rows = np.array([self._rows[ticker] for ticker in changed])
+        new_prices = np.fromiter(quotes.values(), dtype=np.float64, count=len(quotes))
+        before = np.nansum(self.values[rows])
+        self.prices[rows] = new_prices
+        self.values[rows] = self.quantity[rows] * new_prices
+        self.total_value += np.nansum(self.values[rows]) - before
+        return changed
+
+    def fetch_prices(self, client) -> dict:
+        """Last price of every open position: one batched snapshot call through `client`,
+        with the last daily close of the cached bars for the tickers it has no price for"""
+        tickers = self.open_tickers
+        if not tickers:
+            return {}
+        with self.metrics.span("portfolio.fetch_prices", positions=len(tickers)):
+            try:
+                prices = client.get_last_prices(tickers)
+            except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+                self.metrics.error("portfolio.snapshot_failed", e)
+                prices = {}
+            missing = [ticker for ticker in tickers if ticker not in prices]
+            if missing:
+                today = datetime.date.today()
+                panel = client.get_hist_data_many(missing, today - datetime.timedelta(days=7),
+                                                  today)
+                if not panel.empty:
+                    closes = pd.DataFrame(panel.values("Close"), columns=panel.tickers).ffill()
+                    prices.update(closes.iloc[-1].dropna().to_dict())
+        return prices
+
+    def revalue(self, client) -> list:
+        return self.update_prices(self.fetch_prices(client))
+
+    @property
+    def unrealized(self) -> np.ndarray:
+        return self.values - self.cost
+
+    @property
+    def allocation(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.values / self.total_value
+
+    def totals(self) -> dict:
+        priced = ~np.isnan(self.prices)
+        return {"Value": self.total_value, "Cost": self.cost.sum(),
+                "Unrealized P&L": np.nansum(self.unrealized[priced]),
+                "Realized P&L": self.realized.sum()}
+
+    def row(self, ticker: str) -> tuple:
+        """Values of COLUMNS for one position"""
+        row = self._rows[ticker.upper()]
+        return (self.quantity[row], self.prices[row], self.values[row], self.cost[row],
+                self.unrealized[row], self.realized[row], self.allocation[row])
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({"Quantity": self.quantity, "Price": self.prices,
+                             "Value": self.values, "Cost": self.cost,
+                             "Unrealized P&L": self.unrealized, "Realized P&L": self.realized,
+                             "Allocation": self.allocation},
+                            index=pd.Index(self.tickers, name="Ticker"))[self.COLUMNS]
+
+    def history(self, panel, field="Close"):
+        """Daily value, money invested and P&L of the portfolio over the dates of `panel`,
+        and the allocation of every ticker of the panel over the same dates.
+        The quantities held are cumulative sums of the lots placed on a dates x tickers grid,
+        valued at the last known `field` price of each date."""
+        with self.metrics.span("portfolio.history", tickers=len(panel.tickers)):
+            columns = {ticker.upper(): column for column, ticker in enumerate(panel.tickers)}
+            lots = [lot for lot in self.portfolio.lots if lot.ticker in columns]
+            shape = (len(panel.index), len(panel.tickers))
+            bought, invested = np.zeros(shape), np.zeros(shape)
+            if lots:
+                # lots dated before the panel are held from its first date on
+                rows = panel.index.searchsorted(pd.DatetimeIndex([lot.date for lot in lots]))
+                cols = np.array([columns[lot.ticker] for lot in lots])
+                inside = rows < shape[0]
+                at = (rows[inside], cols[inside])
+                np.add.at(bought, at, np.array([lot.quantity for lot in lots])[inside])
+                np.add.at(invested, at, np.array([lot.cash_flow for lot in lots])[inside])
+            held = np.cumsum(bought, axis=0)
+            invested = np.cumsum(invested, axis=0).sum(axis=1)
+
+            prices = pd.DataFrame(panel.values(field), dtype=np.float64).ffill().to_numpy()
+            values = np.where(held != 0, held * prices, 0.0)
+            total = np.nansum(values, axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                allocation = values / total[:, None]
+
+            summary = pd.DataFrame({"Value": total, "Invested": invested,
+                                    "P&L": total - invested}, index=panel.index)
+            return summary, pd.DataFrame(allocation, index=panel.index, columns=panel.tickers)
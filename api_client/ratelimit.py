@@ -0,0 +1,25 @@
+"""Per-host rate limiting shared by all the threads issuing upstream requests"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """Spaces out requests to the same host so that at most `rate` of them start per second.
+    Callers block in `acquire` until their slot comes up; different hosts do not wait on
+    each other."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate if rate > 0 else 0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def acquire(self, host: str) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,76 @@
+"""OHLCV bars at several resolutions.
+Bars are grouped by the start of the period they fall in and aggregated column-wise
+(first open, highest high, lowest low, last close, summed volume), all with vectorized
+group-by operations."""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# finest first
+RESOLUTIONS = ("hour", "day", "week", "month")
+# resolutions rolled up from the daily bars and stored next to them
+ROLLUPS = ("week", "month")
+PERIOD_DAYS = {"hour": 1 / 24, "day": 1, "week": 7, "month": 365.25 / 12}
+# bars per year of each resolution, to annualize statistics (crypto trades every day)
+PERIODS_PER_YEAR = {"hour": 24 * 365, "day": 365, "week": 52, "month": 12}
+
+AGGREGATIONS = {"High": "max", "Low": "min", "Open": "first", "Close": "last",
+                "Volume": "sum", "Adj Close": "last"}
+# cache.FIELDS, which imports this module
+FIELDS = list(AGGREGATIONS)
+
+
+def period_start(index: pd.DatetimeIndex, resolution: str) -> pd.DatetimeIndex:
+    """Start of the `resolution` period each timestamp of `index` falls in"""
+    index = pd.DatetimeIndex(index)
+    if resolution == "hour":
+        return index.floor("h")
+    if resolution == "day":
+        return index.normalize()
+    if resolution == "week":
+        # weeks start on Monday
+        return index.normalize() - pd.to_timedelta(index.dayofweek, unit="D")
+    if resolution == "month":
+        return index.normalize() - pd.to_timedelta(index.day - 1, unit="D")
+    raise ValueError(f"Unknown resolution '{resolution}'")
+
+
+def period_bounds(start: datetime.date, end: datetime.date, resolution: str):
+    """First and last day of the `resolution` periods covering [start, end]"""
+    first = period_start(pd.DatetimeIndex([start]), resolution)[0].date()
+    if resolution == "week":
+        last = end + datetime.timedelta(days=6 - end.weekday())
+    elif resolution == "month":
+        last = (pd.Timestamp(end) + pd.offsets.MonthEnd(0)).date()
+    else:
+        last = end
+    return first, last
+
+
+def resample_ohlcv(table: pd.DataFrame, resolution: str) -> pd.DataFrame:
+    """`table` of finer OHLCV bars aggregated into `resolution` bars indexed by period start.
+    Periods without any bar are left out."""
+    if table.empty:
+        return pd.DataFrame(columns=FIELDS, index=pd.DatetimeIndex([], name="Date"),
+                            dtype=np.float64)
+    keys = period_start(table.index, resolution)
+    grouped = table.reindex(columns=FIELDS).groupby(keys)
+    resampled = grouped.agg(AGGREGATIONS)
+    # a sum over periods without any volume figure is unknown rather than zero
+    resampled["Volume"] = grouped["Volume"].sum(min_count=1)
+    resampled.index.name = "Date"
+    return resampled[FIELDS]
+
+
+def choose_resolution(start_date, end_date, pixels: int, min_bars_per_pixel=0.5,
+                      resolutions=RESOLUTIONS) -> str:
+    """Coarsest resolution whose bars still fill `pixels` horizontal pixels over the range,
+    with at least `min_bars_per_pixel` bars per pixel; the finest one if none does"""
+    days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    needed = pixels * min_bars_per_pixel
+    for resolution in reversed(resolutions):
+        if days / PERIOD_DAYS[resolution] >= needed:
+            return resolution
+    return resolutions[0]
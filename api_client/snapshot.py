@@ -0,0 +1,40 @@
+"""Versioned local snapshot of the ticker universe, so that startup does not have to
+download the full list of tickers again. The pages are stored with their ETag/Last-Modified
+validators, so that a refresh of an unchanged page only costs a 304."""
+
+import json
+import time
+
+from api_client.files import write_json_atomic
+
+
+class TickerSnapshot:
+    # bump whenever the layout of the stored ticker pages changes
+    VERSION = 2
+
+    def __init__(self, path: str, refresh_interval: float) -> None:
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.saved_at = None
+
+    def load(self):
+        """Stored pages (as produced by Client.iter_ticker_pages), or None if there is no
+        usable snapshot"""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != self.VERSION:
+            return None
+
+        self.saved_at = data["saved_at"]
+        return data["pages"]
+
+    def is_stale(self) -> bool:
+        return self.saved_at is None or time.time() - self.saved_at > self.refresh_interval
+
+    def save(self, pages: list) -> None:
+        self.saved_at = time.time()
+        write_json_atomic(self.path, {"version": self.VERSION, "saved_at": self.saved_at,
+                                      "pages": pages})
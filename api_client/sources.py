@@ -0,0 +1,150 @@
+"""Pluggable sources of historical bars.
+A source turns (ticker, start, end, bar size) into a DataFrame with the cache.FIELDS columns.
+The sources to use, and the order in which they are tried when one fails, are set by the
+`backends` key of the [data] section of config.ini."""
+
+import abc
+
+import numpy as np
+import pandas as pd
+import requests.exceptions
+
+from api_client.cache import FIELDS, to_date
+from api_client.metrics import get_metrics
+
+TIMESPANS = ("minute", "hour", "day")
+
+
+class DataSource(abc.ABC):
+    name = ""
+
+    @abc.abstractmethod
+    def fetch(self, info, start_date, end_date, timespan="day", multiplier=1) -> pd.DataFrame:
+        """Bars of the ticker described by the TickerInfo `info`"""
+        ...
+
+
+class PolygonSource(DataSource):
+    """Polygon aggregates API. The JSON bars are read column by column into NumPy arrays."""
+    name = "polygon"
+    AGGS = "/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/{start}/{end}"
+
+    def __init__(self, client) -> None:
+        self.client = client
+
+    def fetch_arrays(self, info, start_date, end_date, timespan="day", multiplier=1) -> dict:
+        """{'t': epoch ms, 'o', 'h', 'l', 'c', 'v'} arrays of the bars, following `next_url`
+        when the range does not fit in one response"""
+        if timespan not in TIMESPANS:
+            raise ValueError(f"Unsupported timespan '{timespan}'")
+        url = self.client.base_url + self.AGGS.format(ticker=info.polygon, multiplier=multiplier,
+                                                      timespan=timespan,
+                                                      start=to_date(start_date).isoformat(),
+                                                      end=to_date(end_date).isoformat())
+        params = {"adjusted": "true", "sort": "asc", "limit": 50000}
+        results = []
+        while url:
+            # the bars of a range are fetched once, there is nothing to revalidate
+            r = self.client.transport.get(url, params=params, headers=self.client.headers,
+                                          revalidate=False)
+            r.raise_for_status()
+            page = r.json()
+            results.extend(page.get("results") or [])
+            url = page.get("next_url")
+            params = None  # the cursor url carries the query
+
+        n = len(results)
+        arrays = {"t": np.fromiter((bar["t"] for bar in results), dtype=np.int64, count=n)}
+        for key in ("o", "h", "l", "c", "v"):
+            arrays[key] = np.fromiter((bar.get(key, np.nan) for bar in results),
+                                      dtype=np.float64, count=n)
+        return arrays
+
+    def fetch(self, info, start_date, end_date, timespan="day", multiplier=1) -> pd.DataFrame:
+        metrics = get_metrics()
+        with metrics.span("source.fetch", source=self.name):
+            arrays = self.fetch_arrays(info, start_date, end_date, timespan, multiplier)
+        with metrics.span("source.to_frame", source=self.name):
+            index = pd.DatetimeIndex(pd.to_datetime(arrays["t"], unit="ms"), name="Date")
+            if timespan == "day":
+                index = index.normalize()
+            # crypto prices have no splits or dividends, the close is also the adjusted close
+            return pd.DataFrame({"High": arrays["h"], "Low": arrays["l"], "Open": arrays["o"],
+                                 "Close": arrays["c"], "Volume": arrays["v"],
+                                 "Adj Close": arrays["c"]}, index=index, columns=FIELDS)
+
+
+class YahooSource(DataSource):
+    """Yahoo daily bars through pandas_datareader.
+    `url` replaces the Yahoo Finance address used by pandas_datareader, e.g. with a local
+    stand-in serving the same pages."""
+    name = "yahoo"
+    HOST = "query1.finance.yahoo.com"
+
+    def __init__(self, client, url="") -> None:
+        self.client = client
+        self.url = url.rstrip("/")
+        self._reader = None
+
+    def _reader_class(self):
+        """pandas_datareader's reader, imported on first use and pointed at `url` if set"""
+        if self._reader is None:
+            from pandas_datareader.yahoo.daily import YahooDailyReader
+
+            self._reader = YahooDailyReader
+            if self.url:
+                history = self.url + "/quote/{}/history"
+                self._reader = type("YahooReader", (YahooDailyReader,),
+                                    {"url": property(lambda reader: history)})
+        return self._reader
+
+    def fetch(self, info, start_date, end_date, timespan="day", multiplier=1) -> pd.DataFrame:
+        if (timespan, multiplier) != ("day", 1):
+            raise ValueError("The Yahoo source only provides daily bars")
+        self.client.transport.rate_limiter.acquire(self.HOST)
+        with get_metrics().span("source.fetch", source=self.name):
+            return self._reader_class()(symbols=info.yahoo, start=start_date, end=end_date,
+                                        session=self.client.transport.session).read()
+
+
+SOURCES = {source.name: source for source in (PolygonSource, YahooSource)}
+
+
+class FallbackSource(DataSource):
+    """Tries each source in turn and returns the result of the first one that succeeds with
+    some bars. An empty result (e.g. Polygon's answer for an unknown pair or a range beyond
+    the plan's history) moves on to the next source as well."""
+    name = "fallback"
+
+    def __init__(self, sources) -> None:
+        self.sources = list(sources)
+
+    def fetch(self, info, start_date, end_date, timespan="day", multiplier=1) -> pd.DataFrame:
+        metrics = get_metrics()
+        error = empty = None
+        for source in self.sources:
+            try:
+                table = source.fetch(info, start_date, end_date, timespan, multiplier)
+            except (requests.exceptions.RequestException, KeyError, ValueError, IOError) as e:
+                # pandas_datareader's RemoteDataError is an IOError
+                metrics.error("source.failed", e, source=source.name, ticker=info.yahoo)
+                error = e
+                continue
+            if not table.empty:
+                return table
+            metrics.incr("source.empty", source=source.name)
+            empty = table
+        if empty is not None:
+            return empty
+        raise error
+
+
+def build_source(client, backends: str, yahoo_url="") -> DataSource:
+    """Source for a comma separated list of backend names, tried in the given order"""
+    names = [name.strip() for name in backends.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown or not names:
+        raise ValueError(f"Unknown data backends {unknown}, expected some of {list(SOURCES)}")
+    sources = [YahooSource(client, yahoo_url) if name == "yahoo" else SOURCES[name](client)
+               for name in names]
+    return sources[0] if len(sources) == 1 else FallbackSource(sources)
@@ -0,0 +1,86 @@
+"""Registry of the crypto tickers known to Polygon, with their Yahoo counterparts"""
+
+# quote currencies tried, longest first, when a ticker record lacks the currency fields
+QUOTE_CURRENCIES = sorted(["USD", "USDT", "USDC", "BUSD", "DAI", "EUR", "GBP", "JPY", "AUD",
+                           "CAD", "CHF", "BTC", "ETH"], key=len, reverse=True)
+
+
+class TickerInfo:
+    __slots__ = ("polygon", "yahoo", "base", "quote", "name", "base_name", "quote_name")
+
+    def __init__(self, polygon, base, quote, name="", base_name="", quote_name="") -> None:
+        self.polygon = polygon
+        self.yahoo = f"{base}-{quote}"
+        self.base = base
+        self.quote = quote
+        self.name = name
+        self.base_name = base_name
+        self.quote_name = quote_name
+
+    def __repr__(self):
+        return f"TickerInfo({self.polygon!r}, {self.yahoo!r})"
+
+
+def split_symbol(symbol: str):
+    """'BTCUSDT' -> ('BTC', 'USDT'), for records without base/quote currency fields"""
+    for quote in QUOTE_CURRENCIES:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol[:-3], symbol[-3:]
+
+
+class TickerRegistry:
+    """Built once from the results of the ticker pages. Resolves a ticker given in either the
+    Polygon ('X:BTCUSD') or the Yahoo ('BTC-USD') notation, case-insensitively, in O(1)."""
+
+    def __init__(self, results=()) -> None:
+        self.tickers = []
+        self._lookup = {}
+        for result in results:
+            polygon = result["ticker"]
+            base = result.get("base_currency_symbol")
+            quote = result.get("currency_symbol")
+            if not base or not quote:
+                base, quote = split_symbol(polygon.split(":")[-1])
+            info = TickerInfo(polygon, base.upper(), quote.upper(), result.get("name", ""),
+                              result.get("base_currency_name", ""),
+                              result.get("currency_name", ""))
+            self.tickers.append(info)
+            self._lookup[info.polygon.lower()] = info
+            self._lookup[info.yahoo.lower()] = info
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, symbol):
+        return symbol.lower() in self._lookup
+
+    def resolve(self, symbol: str):
+        """TickerInfo of `symbol` in either notation, or None if unknown"""
+        return self._lookup.get(symbol.lower())
+
+    def info(self, symbol: str) -> TickerInfo:
+        """TickerInfo of `symbol`, derived from the symbol itself when it is not registered"""
+        info = self.resolve(symbol)
+        if info is not None:
+            return info
+        if "-" in symbol:
+            base, quote = symbol.upper().rsplit("-", 1)
+        else:
+            base, quote = split_symbol(symbol.split(":")[-1].upper())
+        return TickerInfo(f"X:{base}{quote}", base, quote)
+
+    def to_polygon(self, symbol: str) -> str:
+        return self.info(symbol).polygon
+
+    def to_yahoo(self, symbol: str) -> str:
+        info = self.resolve(symbol)
+        if info is not None:
+            return info.yahoo
+        if ":" in symbol:
+            base, quote = split_symbol(symbol.split(":")[-1].upper())
+            return f"{base}-{quote}"
+        return symbol.upper()
+
+    def yahoo_symbols(self) -> list:
+        return [info.yahoo for info in self.tickers]
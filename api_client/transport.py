@@ -0,0 +1,150 @@
+"""Shared HTTP transport for every outbound request made by the api_client package.
+Keeps a pooled keep-alive session, applies connect/read timeouts, retries failed requests
+with exponential backoff and jitter and revalidates previously seen responses with
+ETag/Last-Modified, so that an unchanged resource costs a 304 instead of a full body."""
+
+import collections
+import configparser
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+import requests.adapters
+import requests.exceptions
+
+from api_client.metrics import get_metrics
+from api_client.ratelimit import RateLimiter
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+VALIDATORS = ("ETag", "Last-Modified")
+
+
+def validators(response) -> dict:
+    """ETag and Last-Modified headers of `response`, to revalidate it later"""
+    return {name: response.headers[name] for name in VALIDATORS if name in response.headers}
+
+
+def conditional_headers(validators: dict) -> dict:
+    """Request headers revalidating a response that carried `validators`"""
+    headers = {}
+    if "ETag" in validators:
+        headers["If-None-Match"] = validators["ETag"]
+    if "Last-Modified" in validators:
+        headers["If-Modified-Since"] = validators["Last-Modified"]
+    return headers
+
+
+class Transport:
+
+    def __init__(self, connect_timeout=5.0, read_timeout=30.0, retries=3, backoff=0.5,
+                 pool_size=10, requests_per_second=0, revalidated=64) -> None:
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limiter = RateLimiter(requests_per_second)
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size,
+                                                pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.revalidated = revalidated
+        self._lock = threading.Lock()
+        # request key -> last response carrying a validator, least recently used first
+        self._validated = collections.OrderedDict()
+
+    def _sleep_before_retry(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            # "full jitter": a random delay up to the exponential backoff cap
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+        time.sleep(delay)
+
+    def _send(self, host, url, params, headers, stream, metrics) -> requests.Response:
+        """Issue the request, retrying connection errors and RETRY_STATUSES"""
+        for attempt in range(self.retries + 1):
+            self.rate_limiter.acquire(host)
+            try:
+                response = self.session.get(url, params=params, headers=headers,
+                                            timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.retries:
+                    raise
+                metrics.incr("http.retries", host=host)
+                self._sleep_before_retry(attempt)
+                continue
+
+            # time to the response headers: the upstream share of the http.get span, the rest
+            # is spent connecting, waiting for the rate limiter, retrying and reading the body
+            metrics.observe("http.upstream", response.elapsed.total_seconds(), host=host)
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                metrics.incr("http.retries", host=host)
+                # the dropped response gives its (streamed) connection back to the pool
+                response.close()
+                self._sleep_before_retry(attempt, response)
+                continue
+            return response
+
+    def get(self, url, params=None, headers=None, revalidate=True,
+            stream=False) -> requests.Response:
+        """GET `url` and return the response.
+        With `revalidate`, a response previously received with an ETag or Last-Modified header
+        is revalidated with a conditional request and returned again on a 304. Only the last
+        `revalidated` such responses are kept, so requests for resources that are fetched
+        once (e.g. the bars of a backfill) should pass `revalidate=False`.
+        A `stream`ed response body can only be read once, so it is never revalidated."""
+        revalidate = revalidate and not stream
+        headers = dict(headers or {})
+        key = (url, tuple(sorted((params or {}).items())))
+        with self._lock:
+            cached = self._validated.get(key) if revalidate else None
+            if cached is not None:
+                self._validated.move_to_end(key)
+        if cached is not None:
+            headers.update(conditional_headers(validators(cached)))
+
+        host = urllib.parse.urlsplit(url).netloc
+        metrics = get_metrics()
+        with metrics.in_flight("http.in_flight", host=host), metrics.span("http.get", host=host):
+            response = self._send(host, url, params, headers, stream, metrics)
+
+        if response.status_code == 304 and cached is not None:
+            metrics.incr("http.not_modified", host=host)
+            return cached
+        if revalidate and response.status_code == 200 and validators(response):
+            with self._lock:
+                self._validated[key] = response
+                self._validated.move_to_end(key)
+                while len(self._validated) > self.revalidated:
+                    self._validated.popitem(last=False)
+        return response
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> Transport:
+    """The process-wide transport, configured from the [http] section of config.ini"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            config = configparser.ConfigParser()
+            config.read("config.ini")
+            http_config = config["http"]
+            _transport = Transport(
+                connect_timeout=http_config.getfloat("connect_timeout"),
+                read_timeout=http_config.getfloat("read_timeout"),
+                retries=http_config.getint("retries"),
+                backoff=http_config.getfloat("backoff"),
+                pool_size=http_config.getint("pool_size"),
+                requests_per_second=http_config.getfloat("requests_per_second"),
+                revalidated=http_config.getint("revalidated"),
+            )
+    return _transport
@@ -0,0 +1,55 @@
+"""Export throughput, in rows per second, of every supported format.
+
+    python -m benchmarks.bench_export [--rows 3650] [--tickers 20]
+
+The exported table is a generated panel of daily bars with (ticker, field) columns, the
+same shape HistoricalQuotes exports."""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from api_client.cache import FIELDS
+from api_client.export import FORMATS, export_table
+
+
+def make_table(rows, tickers):
+    index = pd.date_range("2010-01-01", periods=rows, name="Date")
+    columns = pd.MultiIndex.from_product([[f"T{i}-USD" for i in range(tickers)], FIELDS],
+                                         names=["Ticker", "Field"])
+    values = np.random.default_rng(0).random((rows, len(columns))) * 1000
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def run(rows, tickers, formats=FORMATS):
+    table = make_table(rows, tickers)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for exp_format in formats:
+            path = os.path.join(tmp_dir, "export." + exp_format)
+            start = time.perf_counter()
+            export_table(table, path, exp_format)
+            elapsed = time.perf_counter() - start
+            results.append({"format": exp_format, "rows": rows, "columns": table.shape[1],
+                            "seconds": round(elapsed, 4),
+                            "rows_per_s": round(rows / elapsed),
+                            "bytes": os.path.getsize(path)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=3650)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--formats", nargs="*", default=FORMATS, choices=FORMATS)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.tickers, args.formats), indent=2))
+
+
+if __name__ == '__main__':
+    main()
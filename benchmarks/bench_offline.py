@@ -0,0 +1,247 @@
+"""End-to-end benchmark of the api_client and chart code paths against the local stand-in.
+No network access or API key is needed: a benchmarks.stand_in server replaces Polygon, Yahoo,
+CoinMarketCap and Google News, and the run uses a config.ini of its own in a temporary
+directory, so the real caches are left untouched.
+
+    python -m benchmarks.bench_offline [--latency 0.02] [--error-rate 0.05] [--tickers 20]
+
+Prints one JSON document with the import time of the main modules and, per scenario, the
+latency percentiles, throughput and peak traced memory."""
+
+import argparse
+import configparser
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+import numpy as np
+
+from benchmarks.stand_in import StandIn
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["api_client.client", "api_client.coinmarket_scraper", "api_client.news",
+           "api_client.analytics", "api_client.export", "gui.chart"]
+SCENARIOS = ["client_init", "hist_cold", "hist_warm", "last_prices", "scraper", "news", "render",
+             "portfolio"]
+
+
+def import_times(modules=MODULES):
+    """Cumulative `-X importtime` of each module, in ms, each in a fresh interpreter"""
+    times = {}
+    for module in modules:
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                cwd=REPO, capture_output=True, text=True)
+        for line in result.stderr.splitlines():
+            match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", line)
+            if match and match.group(2) == module:
+                times[module] = round(int(match.group(1)) / 1000, 1)
+    return times
+
+
+def write_config(tmp_dir, url, args):
+    """config.ini of the repo, pointed at the stand-in and at caches inside `tmp_dir`"""
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO, "config.ini"))
+    config["scraper"]["url"] = url + "/coins"
+    config["client"]["base_url"] = url
+    config["data"]["backends"] = args.backends
+    config["data"]["yahoo_url"] = url
+    config["cache"]["path"] = os.path.join(tmp_dir, "hist_data.sqlite3")
+    config["tickers"]["snapshot"] = os.path.join(tmp_dir, "tickers.json")
+    config["assets"]["cache_dir"] = os.path.join(tmp_dir, "assets")
+    config["portfolio"]["path"] = os.path.join(tmp_dir, "portfolio.json")
+    config["http"]["requests_per_second"] = str(args.rps)
+    config["http"]["backoff"] = str(args.backoff)
+    config["metrics"]["enabled"] = str(args.metrics).lower()
+    config["metrics"]["log"] = ""
+    config["metrics"]["dump"] = ""
+    with open(os.path.join(tmp_dir, "config.ini"), "w") as f:
+        config.write(f)
+
+
+class _NewsRedirect(urllib.request.BaseHandler):
+    """Sends the requests GoogleNews makes to news.google.com to the stand-in instead"""
+
+    def __init__(self, url) -> None:
+        self.url = url
+
+    def https_request(self, request):
+        if request.host == "news.google.com":
+            request.full_url = request.full_url.replace("https://news.google.com",
+                                                        self.url + "/news", 1)
+        return request
+
+
+def summarize(name, latencies, ops_per_run, peak_bytes):
+    latencies = np.asarray(latencies) * 1000
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {"scenario": name, "runs": len(latencies), "ops_per_run": ops_per_run,
+            "p50_ms": round(p50, 2), "p90_ms": round(p90, 2), "p99_ms": round(p99, 2),
+            "mean_ms": round(latencies.mean(), 2),
+            "throughput_ops_s": round(ops_per_run * len(latencies) / latencies.sum() * 1000, 1),
+            "peak_traced_kb": round(peak_bytes / 1024)}
+
+
+def measure(name, scenario, repeat):
+    """Time `repeat` runs of `scenario`, then trace the memory of one more run (tracing
+    slows the code down, so it is kept out of the timed runs)"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = scenario()
+        latencies.append(time.perf_counter() - start)
+    tracemalloc.start()
+    scenario()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(name, latencies, ops, peak)
+
+
+def build_scenarios(tmp_dir, args):
+    # imported here: the modules read config.ini from the working directory when used
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    from api_client.analytics import PanelAnalytics
+    from api_client.cache import HistCache
+    from api_client.client import Client
+    from api_client.coinmarket_scraper import Scraper
+    from api_client.news import NewsService
+    from api_client.portfolio import Portfolio, Valuation
+    from gui.chart import minmax_decimate
+
+    client = Client()
+    tickers = client.registry.yahoo_symbols()[:args.tickers]
+    end = np.datetime64("today").astype(object)
+    start = end.replace(year=end.year - args.years)
+    queries = [f"Coin {i}" for i in range(args.queries)]
+    runs = {"cold": 0}
+
+    def client_init():
+        if os.path.exists(client.snapshot.path):
+            os.remove(client.snapshot.path)  # load the tickers from the stand-in
+        Client()
+        return 1
+
+    def hist_cold():
+        runs["cold"] += 1
+        client.cache = HistCache(os.path.join(tmp_dir, f"cold_{runs['cold']}.sqlite3"))
+        client.get_hist_data_many(tickers, start, end)
+        return len(tickers)
+
+    def hist_warm():
+        client.get_hist_data_many(tickers, start, end)
+        return len(tickers)
+
+    def last_prices():
+        client.get_last_prices(tickers)
+        return len(tickers)
+
+    def scraper():
+        Scraper().scrape_coin_names()
+        return 1
+
+    def news():
+        service = NewsService(ttl=0, max_workers=args.news_workers)
+        for future in service.prefetch(queries):
+            future.result()
+        return len(queries)
+
+    panel = client.get_hist_data_many(tickers, start, end)
+
+    def render():
+        """What the Chart draws for the panel, on the Agg canvas instead of Tk"""
+        analytics = PanelAnalytics(panel)
+        analytics.update()
+        figure = plt.Figure(figsize=(7, 5.5), dpi=100)
+        ax = figure.add_subplot(111)
+        canvas = FigureCanvasAgg(figure)
+        x = matplotlib.dates.date2num(np.asarray(panel.index, dtype="datetime64[us]"))
+        for ticker in panel.tickers:
+            ax.plot(*minmax_decimate(x, panel.series("Close", ticker), int(ax.bbox.width)),
+                    label=ticker)
+        ax.legend()
+        canvas.draw()
+        return len(panel.tickers)
+
+    holdings = Portfolio(os.path.join(tmp_dir, "portfolio.json"))
+    for i, ticker in enumerate(client.registry.yahoo_symbols()[:args.positions]):
+        holdings.add(ticker, 1 + i % 7, 100, start)
+        holdings.add(ticker, -0.5, 120, end)
+    holdings.save()
+
+    def portfolio():
+        """Load and revalue the whole portfolio, then apply a live update of a tenth of it"""
+        valuation = Valuation(Portfolio(holdings.path).load())
+        valuation.revalue(client)
+        tick = valuation.tickers[::10]
+        valuation.update_prices(dict(zip(tick, valuation.prices[::10] * 1.01)))
+        return len(valuation.tickers)
+
+    return {"client_init": client_init, "hist_cold": hist_cold, "hist_warm": hist_warm,
+            "last_prices": last_prices, "scraper": scraper, "news": news, "render": render,
+            "portfolio": portfolio}
+
+
+def run(args):
+    report = {"settings": vars(args), "import_time_ms": import_times()}
+    cwd = os.getcwd()
+    with StandIn(fixtures=args.fixtures, latency=args.latency, jitter=args.jitter,
+                 error_rate=args.error_rate, n_tickers=max(args.tickers, args.positions, 20)) as stand_in, \
+            tempfile.TemporaryDirectory() as tmp_dir:
+        write_config(tmp_dir, stand_in.url, args)
+        urllib.request.install_opener(urllib.request.build_opener(_NewsRedirect(stand_in.url)))
+        os.chdir(tmp_dir)
+        try:
+            scenarios = build_scenarios(tmp_dir, args)
+            report["scenarios"] = [measure(name, scenarios[name], args.repeat)
+                                   for name in args.scenarios]
+            if args.metrics:
+                from api_client.metrics import get_metrics
+                report["metrics"] = get_metrics().snapshot()
+        finally:
+            os.chdir(cwd)
+        report["stand_in"] = {"requests": stand_in.requests,
+                              "injected_errors": stand_in.errors}
+    report["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", help="directory of recorded responses, see stand_in")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of the requests answered with a 503")
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--years", type=int, default=2, help="span of the historical data")
+    parser.add_argument("--positions", type=int, default=200,
+                        help="positions of the portfolio scenario")
+    parser.add_argument("--queries", type=int, default=5, help="news searches per run")
+    parser.add_argument("--news-workers", type=int, default=4)
+    parser.add_argument("--backends", default="polygon", help="[data] backends of the run")
+    parser.add_argument("--rps", type=float, default=0,
+                        help="[http] requests_per_second of the run, 0 for no limit")
+    parser.add_argument("--backoff", type=float, default=0.05,
+                        help="[http] backoff of the run, in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--metrics", action="store_true",
+                        help="enable the instrumentation and add its aggregates to the report")
+    parser.add_argument("--scenarios", nargs="*", default=SCENARIOS, choices=SCENARIOS)
+    args = parser.parse_args()
+    print(json.dumps(run(args), indent=2))
+
+
+if __name__ == '__main__':
+    main()
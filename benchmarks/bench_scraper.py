@@ -0,0 +1,101 @@
+"""Compare the streaming coin listing parser with the previous BeautifulSoup approach.
+Each approach runs in its own process, so that the peak RSS figures do not mix.
+
+    python -m benchmarks.bench_scraper [--fixture saved_page.html] [--rows 10000]
+
+Without --fixture, a synthetic page shaped like the CoinMarketCap "all" listing is generated."""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+from api_client.coinmarket_scraper import extract_name, parse_coins
+
+ROW = ('<tr class="cmc-table-row"><td><div>{rank}</div></td>'
+       '<td><div><a href="/currencies/coin-{rank}/">'
+       '<span class="symbol">C{rank}</span><span class="name">Coin {rank}</span></a></div></td>'
+       '<td><div>C{rank}</div></td>'
+       '<td><p><span>${cap:,.0f}</span></p></td>'
+       '<td><div><a href="/currencies/coin-{rank}/#markets">${price:,.2f}</a></div></td>'
+       '<td><div>{cap:,.0f} C{rank}</div></td><td><a>${cap:,.0f}</a></td>'
+       '<td><div>0.15%</div></td><td><div>-1.20%</div></td><td><div>4.01%</div></td>'
+       '<td><div><button>...</button></div></td></tr>\n')
+
+
+def make_fixture(path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<html><head><title>All Cryptocurrencies</title></head><body>"
+                + "<div>navigation</div>" * 500
+                + "<table><thead><tr><th>#</th><th>Name</th><th>Symbol</th></tr></thead><tbody>\n")
+        for rank in range(1, rows + 1):
+            f.write(ROW.format(rank=rank, cap=1e9 / rank, price=1e4 / rank))
+        f.write("</tbody></table>" + "<div>footer</div>" * 500 + "</body></html>")
+
+
+def soup_names(path):
+    """The approach used before the streaming parser: build the whole tree, then walk it"""
+    from bs4 import BeautifulSoup
+
+    with open(path, encoding="utf-8") as f:
+        soup = BeautifulSoup(f.read(), "lxml")
+    result = []
+    for row in soup.find("tbody").find_all("tr"):
+        cells = row.find_all("td")
+        result.append(extract_name(cells[1].text, cells[2].text))
+    return result
+
+
+def streaming_names(path):
+    with open(path, "rb") as f:
+        chunks = iter(lambda: f.read(64 * 1024), b"")
+        return [coin.name for coin in parse_coins(chunks)]
+
+
+APPROACHES = {"soup": soup_names, "streaming": streaming_names}
+
+
+def _measure(name, path, queue):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    names = APPROACHES[name](path)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({"approach": name, "rows": len(names), "parse_time_s": round(elapsed, 4),
+               "peak_rss_kb": rss_after, "peak_rss_growth_kb": rss_after - rss_before})
+
+
+def run(path):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for name in APPROACHES:
+        queue = context.Queue()
+        process = context.Process(target=_measure, args=(name, path, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixture", help="saved coin listing page")
+    parser.add_argument("--rows", type=int, default=10000,
+                        help="rows of the generated page when no fixture is given")
+    args = parser.parse_args()
+
+    if args.fixture:
+        results = run(args.fixture)
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "coins.html")
+            make_fixture(path, args.rows)
+            results = run(path)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
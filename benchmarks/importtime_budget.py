@@ -0,0 +1,139 @@
+"""Enforce the import time budget recorded in benchmarks/importtime_budget.json.
+Each module is imported in fresh interpreters with `-X importtime`; the median cumulative
+import time over the runs must stay within the module's `max_ms`, and none of its
+`forbidden` modules may end up in sys.modules. Exits with status 1 on any violation.
+The "first window" entry runs main() instead and measures the time from process start to
+the first window, bootstrap threads included, since their imports compete with Tk startup
+for the GIL. It needs a display and is skipped without one; a `max_ms` of null is only
+reported, until --record sets it.
+
+    python -m benchmarks.importtime_budget [--runs 5]
+    python -m benchmarks.importtime_budget --record [--headroom 1.5]
+
+--record rewrites the budget from the current measurements times the headroom factor,
+keeping the forbidden lists."""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET = os.path.join(REPO, "benchmarks", "importtime_budget.json")
+
+PROBE = ("import {module}, os, sys, json; "
+         "print(json.dumps(sorted(sys.modules)), flush=True); os._exit(0)")
+
+FIRST_WINDOW = "first window"
+# the process exits as soon as the first window is marked, without waiting for the
+# bootstrap threads
+FIRST_WINDOW_PROBE = """
+import time
+started_at = time.perf_counter()
+import json, os, sys
+import main
+from gui import bootstrap
+
+main.STARTED_AT = started_at
+report_startup = bootstrap.report_startup
+
+def report_and_exit(widget):
+    report_startup(widget)
+    print(json.dumps([bootstrap.timer.marks["first window"] * 1000, sorted(sys.modules)]),
+          flush=True)
+    os._exit(0)
+
+bootstrap.report_startup = report_and_exit
+main.main()
+"""
+
+
+class NoDisplay(RuntimeError):
+    pass
+
+
+def measure(module):
+    """(cumulative import time in ms, modules loaded by then) of one fresh interpreter"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             PROBE.format(module=module)],
+                            cwd=REPO, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000, set(json.loads(result.stdout))
+    raise RuntimeError(f"no -X importtime entry for {module}")
+
+
+def measure_first_window():
+    """(ms from process start to the first window, modules loaded by then) of one run"""
+    result = subprocess.run([sys.executable, "-c", FIRST_WINDOW_PROBE], cwd=REPO,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        if "TclError" in result.stderr and "display" in result.stderr:
+            raise NoDisplay("no display to open the first window on")
+        raise RuntimeError(f"main() failed:\n{result.stderr[-2000:]}")
+    elapsed, modules = json.loads(result.stdout.splitlines()[-1])
+    return elapsed, set(modules)
+
+
+def check(budget, runs):
+    report, violations = [], []
+    for module, limits in budget.items():
+        times, loaded = [], set()
+        try:
+            for _ in range(runs):
+                if module == FIRST_WINDOW:
+                    elapsed, modules = measure_first_window()
+                else:
+                    elapsed, modules = measure(module)
+                times.append(elapsed)
+                loaded |= modules
+        except NoDisplay as e:
+            report.append({"module": module, "skipped": str(e)})
+            continue
+        median = statistics.median(times)
+        forbidden = sorted(name for name in limits.get("forbidden", []) if name in loaded)
+        report.append({"module": module, "median_ms": round(median, 1),
+                       "max_ms": limits["max_ms"], "forbidden_loaded": forbidden})
+        if limits["max_ms"] is not None and median > limits["max_ms"]:
+            violations.append(f"{module}: {median:.1f} ms > budget {limits['max_ms']} ms")
+        if forbidden:
+            violations.append(f"{module}: imports {', '.join(forbidden)}")
+    return report, violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--record", action="store_true",
+                        help="write the current measurements as the new budget")
+    parser.add_argument("--headroom", type=float, default=1.5,
+                        help="factor applied to the measurements by --record")
+    args = parser.parse_args()
+
+    with open(BUDGET, encoding="utf-8") as f:
+        budget = json.load(f)
+    report, violations = check(budget, args.runs)
+
+    if args.record:
+        for entry in report:
+            if "median_ms" in entry:
+                budget[entry["module"]]["max_ms"] = round(entry["median_ms"] * args.headroom)
+        with open(BUDGET, "w", encoding="utf-8") as f:
+            json.dump(budget, f, indent=2)
+            f.write("\n")
+        violations = [violation for violation in violations if "imports" in violation]
+
+    print(json.dumps(report, indent=2))
+    if violations:
+        print("\n".join(["Import time budget exceeded:"] + violations), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Local HTTP stand-in for Polygon, Yahoo Finance, CoinMarketCap and Google News.
+Requests are answered from recorded fixtures when a fixture directory holds one for the
+requested path, and from generated responses shaped like the real ones otherwise. Every
+response can be delayed (`latency` plus up to `jitter` seconds) and a fraction `error_rate`
+of them is answered with a 503 instead, to exercise the retry paths.
+
+Recorded fixtures are files named after the URL-quoted request path, without the query, e.g.
+`%2Fv3%2Freference%2Ftickers.json` for /v3/reference/tickers.
+
+    python -m benchmarks.stand_in [--port 8765] [--latency 0.05] [--error-rate 0.1]
+
+Routes:
+    /v3/reference/tickers                     Polygon ticker universe
+    /v2/aggs/ticker/<ticker>/range/...        Polygon aggregates
+    /v2/snapshot/locale/global/markets/...    Polygon snapshot
+    /quote/<symbol>/history                   Yahoo Finance history page
+    /coins                                    CoinMarketCap listing page
+    /news/search                              Google News search page"""
+
+import argparse
+import datetime
+import http.server
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+
+import numpy as np
+
+from benchmarks.bench_scraper import make_fixture
+
+BASES = ["BTC", "ETH", "LTC", "XRP", "DOGE", "ADA", "SOL", "DOT", "AVAX", "LINK", "UNI", "ATOM",
+         "XLM", "ALGO", "TRX", "ETC", "BCH", "FIL", "AAVE", "EOS"]
+
+NEWS_ARTICLE = ('<c-wiz data-node-index="1;{i}"><article><figure><img src="/img/{i}.jpg"></figure>'
+                '<a href="./articles/{slug}-{i}">.</a><a>{query} headline number {i}</a>'
+                '<div data-n-tid="1">Crypto Daily</div>'
+                '<time datetime="2022-01-{day:02d}T10:00:00Z">{day} Jan</time></article></c-wiz>')
+
+
+def _rng(key):
+    """Random generator seeded by `key`, so that a ticker always gets the same prices"""
+    return np.random.default_rng(zlib.crc32(key.encode()))
+
+
+def ticker_universe(n_tickers):
+    results = []
+    for i in range(n_tickers):
+        base = BASES[i] if i < len(BASES) else f"C{i}"
+        results.append({"ticker": f"X:{base}USD", "name": f"{base} - United States Dollar",
+                        "market": "crypto", "active": True,
+                        "currency_symbol": "USD", "currency_name": "United States Dollar",
+                        "base_currency_symbol": base, "base_currency_name": base})
+    return results
+
+
+def daily_bars(ticker, start, end):
+    """(epoch seconds, open, high, low, close, volume) arrays of a random walk, one bar a day"""
+    days = np.arange(np.datetime64(start), np.datetime64(end) + 1, dtype="datetime64[D]")
+    rng = _rng(ticker)
+    # the walk starts at a fixed date, so overlapping ranges agree on their common bars
+    offset = max((np.datetime64(start) - np.datetime64("2015-01-01")).astype(int), 0)
+    steps = rng.normal(0, 0.03, offset + len(days))
+    close = 100 * np.exp(np.cumsum(steps))[offset:]
+    opens = close * np.exp(rng.normal(0, 0.01, len(days)))
+    high = np.maximum(opens, close) * 1.01
+    low = np.minimum(opens, close) * 0.99
+    volume = rng.uniform(1e3, 1e6, len(days))
+    seconds = days.astype("datetime64[s]").astype(np.int64)
+    return seconds, opens, high, low, close, volume
+
+
+class StandIn:
+
+    def __init__(self, port=0, fixtures=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 n_tickers=200, n_coins=5000, seed=0) -> None:
+        self.fixtures = fixtures
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.tickers = ticker_universe(n_tickers)
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "coins.html")
+            make_fixture(path, n_coins)
+            with open(path, "rb") as f:
+                self._coins = f.read()
+
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stand_in._handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandIn":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True,
+                                        name="stand-in")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handle(self, request):
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            return self._send(request, 503, b"injected error", "text/plain")
+
+        url = urllib.parse.urlsplit(request.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        recorded = self._recorded(url.path)
+        if recorded is not None:
+            return self._send(request, 200, *recorded)
+        try:
+            body, content_type = self._generate(url.path, query)
+        except (KeyError, ValueError):
+            return self._send(request, 404, b"not found", "text/plain")
+        self._send(request, 200, body, content_type)
+
+    def _recorded(self, path):
+        if not self.fixtures:
+            return None
+        name = urllib.parse.quote(path, safe="")
+        for extension, content_type in ((".json", "application/json"), (".html", "text/html")):
+            fixture = os.path.join(self.fixtures, name + extension)
+            if os.path.exists(fixture):
+                with open(fixture, "rb") as f:
+                    return f.read(), content_type
+        return None
+
+    def _generate(self, path, query):
+        parts = path.strip("/").split("/")
+        if path == "/v3/reference/tickers":
+            return self._json({"results": self.tickers, "status": "OK",
+                               "count": len(self.tickers)})
+        if path.startswith("/v2/aggs/ticker/"):
+            # /v2/aggs/ticker/<ticker>/range/<multiplier>/<timespan>/<from>/<to>
+            ticker, start, end = parts[3], parts[7], parts[8]
+            t, o, h, l, c, v = daily_bars(ticker, start, end)
+            results = [{"t": int(ms), "o": oo, "h": hh, "l": ll, "c": cc, "v": vv}
+                       for ms, oo, hh, ll, cc, vv in zip(t * 1000, o, h, l, c, v)]
+            return self._json({"ticker": ticker, "results": results,
+                               "resultsCount": len(results), "status": "OK"})
+        if path.startswith("/v2/snapshot/"):
+            today = datetime.date.today().isoformat()
+            snapshots = []
+            for ticker in query.get("tickers", "").split(","):
+                if ticker:
+                    close = daily_bars(ticker, today, today)[4][-1]
+                    snapshots.append({"ticker": ticker, "lastTrade": {"p": close},
+                                      "day": {"c": close}})
+            return self._json({"tickers": snapshots, "status": "OK"})
+        if parts[0] == "quote" and parts[-1] == "history":
+            return self._yahoo_history(parts[1], query)
+        if path == "/coins":
+            return self._coins, "text/html"
+        if path == "/news/search":
+            return self._news(query.get("q", "crypto")), "text/html"
+        raise KeyError(path)
+
+    @staticmethod
+    def _json(data):
+        return json.dumps(data).encode(), "application/json"
+
+    @staticmethod
+    def _yahoo_history(symbol, query):
+        """The page parsed by pandas_datareader's Yahoo reader: prices in a JS assignment"""
+        start = datetime.datetime.utcfromtimestamp(int(query.get("period1", 1577836800)))
+        end = datetime.datetime.utcfromtimestamp(int(query.get("period2", time.time())))
+        polygon = "X:" + symbol.replace("-", "")
+        t, o, h, l, c, v = daily_bars(polygon, start.date().isoformat(), end.date().isoformat())
+        prices = [{"date": int(s), "open": oo, "high": hh, "low": ll, "close": cc,
+                   "volume": vv, "adjclose": cc}
+                  for s, oo, hh, ll, cc, vv in zip(t, o, h, l, c, v)][::-1]
+        store = {"context": {"dispatcher": {"stores": {"HistoricalPriceStore": {
+            "prices": prices, "isPending": False, "firstTradeDate": int(t[0]) if len(t) else 0,
+            "eventsData": []}}}}}
+        page = ("<html><body><script>(function (root) {\nroot.App.main = "
+                + json.dumps(store) + ";\n}(this));\n</script></body></html>")
+        return page.encode(), "text/html"
+
+    @staticmethod
+    def _news(query):
+        slug = urllib.parse.quote(query.split(" when:")[0].lower())
+        articles = "".join(NEWS_ARTICLE.format(i=i, slug=slug, query=query.split(" when:")[0],
+                                               day=1 + i % 28)
+                           for i in range(30))
+        return f"<html><body><main>{articles}</main></body></html>".encode()
+
+    @staticmethod
+    def _send(request, status, body, content_type):
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="directory of recorded responses")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of the requests answered with a 503")
+    args = parser.parse_args()
+
+    stand_in = StandIn(args.port, args.fixtures, args.latency, args.jitter, args.error_rate)
+    print(f"Serving on {stand_in.url}")
+    stand_in.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Headless entry point: bulk historical downloads without the Tk application.
+Only the api_client package is used, so tkinter, matplotlib and PIL are never imported.
+
+    python cli.py backfill --all --start 2019-01-01 --out backfill/
+    python cli.py backfill --tickers BTC-USD ETH-USD --start 2022-01-01 --format csv
+    python cli.py tickers
+    python cli.py portfolio add BTC-USD 0.5 30000 --date 2023-05-01
+    python cli.py portfolio show
+
+An interrupted backfill is resumed by running the same command again."""
+
+import argparse
+import configparser
+import datetime
+import sys
+
+from api_client.backfill import BACKFILL_FORMATS, Backfill
+from api_client.client import Client
+from api_client.portfolio import Portfolio, Valuation
+from api_client.sources import TIMESPANS
+
+
+def _read_tickers(args, client):
+    if args.all:
+        return client.registry.yahoo_symbols()
+    tickers = list(args.tickers or [])
+    if args.tickers_file:
+        with open(args.tickers_file, encoding="utf-8") as f:
+            tickers += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return tickers
+
+
+def backfill(args):
+    client = Client()
+    tickers = _read_tickers(args, client)
+    if not tickers:
+        sys.exit("No tickers given: use --tickers, --tickers-file or --all")
+
+    job = Backfill(client, tickers, args.start, args.end, args.out, args.format,
+                   timespan=args.timespan, workers=args.workers or client.max_workers,
+                   use_cache=args.cache, restart=args.restart)
+    pending = job.pending()
+    print(f"{len(tickers) - len(pending)} of {len(tickers)} tickers already done, "
+          f"fetching {len(pending)}")
+    done = 0
+
+    def progress(ticker, rows, error):
+        nonlocal done
+        done += 1
+        status = f"failed: {error}" if error is not None else f"{rows} rows"
+        print(f"[{done}/{len(pending)}] {ticker} {status}", flush=True)
+
+    job.run(progress)
+    if job.failed:
+        print(f"{len(job.failed)} tickers failed, run the command again to retry them")
+        sys.exit(1)
+
+
+def list_tickers(args):
+    for ticker in Client().registry.yahoo_symbols():
+        print(ticker)
+
+
+def _portfolio(registry=None):
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    return Portfolio(config["portfolio"]["path"], registry).load()
+
+
+def portfolio_add(args):
+    portfolio = _portfolio(Client().registry)
+    try:
+        lot = portfolio.add(args.ticker, args.quantity, args.price, args.date, args.fee)
+    except ValueError as e:
+        sys.exit(str(e))
+    portfolio.save()
+    print(f"Recorded {lot}")
+
+
+def portfolio_show(args):
+    valuation = Valuation(_portfolio())
+    valuation.revalue(Client())
+    print(valuation.to_frame().round(4).to_string())
+    for name, value in valuation.totals().items():
+        print(f"{name}: {value:,.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill_parser = commands.add_parser("backfill", help="download bars to one file per ticker")
+    choice = backfill_parser.add_mutually_exclusive_group(required=True)
+    choice.add_argument("--tickers", nargs="+", help="tickers in either notation")
+    choice.add_argument("--tickers-file", help="file with one ticker per line")
+    choice.add_argument("--all", action="store_true", help="the whole ticker universe")
+    backfill_parser.add_argument("--start", type=datetime.date.fromisoformat, required=True)
+    backfill_parser.add_argument("--end", type=datetime.date.fromisoformat,
+                                 help="today by default; an interrupted run resumed later "
+                                      "keeps the end date it started with")
+    backfill_parser.add_argument("--out", default="backfill", help="output directory")
+    backfill_parser.add_argument("--format", choices=BACKFILL_FORMATS, default="parquet")
+    backfill_parser.add_argument("--timespan", choices=TIMESPANS, default="day")
+    backfill_parser.add_argument("--workers", type=int,
+                                 help="parallel downloads, [client] max_workers by default")
+    backfill_parser.add_argument("--cache", action="store_true",
+                                 help="keep the daily bars in the local cache as well")
+    backfill_parser.add_argument("--restart", action="store_true",
+                                 help="ignore the checkpoint and fetch every ticker again")
+    backfill_parser.set_defaults(func=backfill)
+
+    tickers_parser = commands.add_parser("tickers", help="list the ticker universe")
+    tickers_parser.set_defaults(func=list_tickers)
+
+    portfolio_parser = commands.add_parser("portfolio", help="record and value the holdings")
+    portfolio_commands = portfolio_parser.add_subparsers(dest="action", required=True)
+    add_parser = portfolio_commands.add_parser("add", help="record a transaction lot")
+    add_parser.add_argument("ticker", help="ticker in either notation")
+    add_parser.add_argument("quantity", type=float, help="negative for a sale")
+    add_parser.add_argument("price", type=float, help="price per unit")
+    add_parser.add_argument("--date", type=datetime.date.fromisoformat,
+                            default=datetime.date.today())
+    add_parser.add_argument("--fee", type=float, default=0.0)
+    add_parser.set_defaults(func=portfolio_add)
+    show_parser = portfolio_commands.add_parser("show", help="value the positions at the last "
+                                                             "prices")
+    show_parser.set_defaults(func=portfolio_show)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
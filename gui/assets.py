@@ -0,0 +1,80 @@
+"""Process-wide cache of the decoded static images.
+Every asset is decoded (and resized) once per process and the resulting PhotoImage objects
+are shared by all the widgets showing it. Decoded variants are also written to disk as PNG
+files, which Tk reads natively, so later launches skip PIL decoding and resizing entirely."""
+
+import configparser
+import functools
+import os
+import tkinter
+
+_photos = {}
+_gifs = {}
+
+
+@functools.lru_cache(maxsize=None)
+def _cache_dir():
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    return config["assets"]["cache_dir"]
+
+
+def _variant_path(path, size):
+    """Location of the PNG variant of `path`; it embeds the source mtime, so an edited
+    asset gets a new variant"""
+    name = os.path.splitext(os.path.basename(path.replace("\\", "/")))[0]
+    suffix = f"_{size[0]}x{size[1]}" if size else ""
+    mtime = int(os.path.getmtime(path))
+    return os.path.join(_cache_dir(), f"{name}{suffix}_{mtime}.png")
+
+
+def photo(path, size=None) -> tkinter.PhotoImage:
+    """The image at `path`, resized to `size` if given"""
+    key = (path, size)
+    if key not in _photos:
+        variant = _variant_path(path, size)
+        if not os.path.exists(variant):
+            # PIL is only imported when a variant has to be made, i.e. on the first launch
+            from PIL import Image
+
+            im = Image.open(path)
+            if size:
+                im = im.resize(size)
+            os.makedirs(os.path.dirname(variant), exist_ok=True)
+            im.save(variant)
+        _photos[key] = tkinter.PhotoImage(file=variant)
+    return _photos[key]
+
+
+def _gif_delay(path, default=100) -> int:
+    """Delay of the first frame of the gif at `path` in ms, read from its graphic control
+    extension (0x21 0xF9 0x04, a packed byte, then the delay in hundredths of a second)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    start = data.find(b"\x21\xf9\x04")
+    if start < 0 or start + 6 > len(data):
+        return default
+    delay = int.from_bytes(data[start + 4:start + 6], "little") * 10
+    return delay or default
+
+
+def gif_frames(path):
+    """All the frames of the gif at `path` and the delay between them in ms.
+    Tk decodes gifs natively and the delay is read from the file, so PIL is not needed."""
+    if path not in _gifs:
+        frames = []
+        while True:
+            try:
+                frames.append(tkinter.PhotoImage(file=path, format=f"gif -index {len(frames)}"))
+            except tkinter.TclError:
+                break
+        _gifs[path] = (frames, _gif_delay(path))
+    return _gifs[path]
+
+
+def preload(images=(), gifs=()):
+    """Decode assets ahead of their first use, e.g. right after the first window appears"""
+    for path, size in images:
+        photo(path, size)
+    for path in gifs:
+        gif_frames(path)
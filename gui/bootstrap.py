@@ -0,0 +1,146 @@
+"""Deferred loading of the resources the screens depend on.
+Once `start` is called, the API client (with its ticker list), the Google News client and
+the list of coin names are loaded concurrently in the background, so the first window is
+shown without waiting for any network round-trip. Screens that need them wait on the
+corresponding future. The api_client modules (and with them pandas, lxml and GoogleNews)
+are imported by the loading threads as well, so importing this module is cheap and starts
+nothing."""
+
+import concurrent.futures
+import configparser
+import importlib
+import time
+
+from gui.search import SearchIndex
+
+
+class StartupTimer:
+    """Records the time elapsed since `t0` (a `time.perf_counter()` value taken at process
+    start) at named startup milestones"""
+
+    def __init__(self) -> None:
+        self.t0 = time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name: str) -> None:
+        if name not in self.marks:
+            self.marks[name] = time.perf_counter() - self.t0
+
+    def report(self) -> str:
+        lines = ["Startup timing report:"]
+        for name, elapsed in sorted(self.marks.items(), key=lambda item: item[1]):
+            lines.append(f"  {name:<25} {elapsed * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+def _load_api_client():
+    from api_client.client import Client
+
+    client = Client()
+    timer.mark("tickers loaded")
+    return client
+
+
+def _load_ticker_list():
+    try:
+        ticker_list = api_client.result().registry.yahoo_symbols()
+    except Exception as e:
+        print(e)
+        ticker_list = []
+    return ticker_list
+
+
+def _load_news_service():
+    from api_client.news import NewsService
+
+    config = configparser.ConfigParser()
+    config.read("config.ini")
+    news_config = config["news"]
+    return NewsService(ttl=news_config.getfloat("ttl"),
+                       max_workers=news_config.getint("max_workers"),
+                       period=news_config["period"],
+                       lang=news_config["lang"])
+
+
+def _load_coin_names():
+    from api_client.coinmarket_scraper import Scraper
+
+    try:
+        coin_names = Scraper().scrape_coin_names()
+    except Exception as e:
+        print(e)
+        coin_names = []
+    timer.mark("coin names loaded")
+    return coin_names
+
+
+timer = StartupTimer()
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="bootstrap")
+
+# futures of the resources, set by `start`
+api_client = None
+ticker_list = None
+news_service = None
+coin_names = None
+
+
+def start(t0=None) -> None:
+    """Start loading the resources in the background; `t0` is the `time.perf_counter()`
+    value the startup timings are measured from, the time of this call by default"""
+    global api_client, ticker_list, news_service, coin_names
+    if api_client is not None:
+        return
+    timer.t0 = time.perf_counter() if t0 is None else t0
+    api_client = _executor.submit(_load_api_client)
+    ticker_list = _executor.submit(_load_ticker_list)
+    news_service = _executor.submit(_load_news_service)
+    coin_names = _executor.submit(_load_coin_names)
+
+
+_search_indexes = {}
+
+
+def search_index(future):
+    """Future of the SearchIndex over the list produced by `future`, built once in the
+    background and shared by every screen"""
+    if future not in _search_indexes:
+        _search_indexes[future] = _executor.submit(lambda: SearchIndex(future.result()))
+    return _search_indexes[future]
+
+
+def preload_modules(names):
+    """Import the modules of the screens not opened yet in the background, so that opening
+    them later does not pay for the import"""
+    return [_executor.submit(importlib.import_module, name) for name in names]
+
+
+def when_ready(widget, future, callback, interval=100):
+    """Call `callback(result)` on the Tk main loop once `future` is done.
+    Tk widgets must not be touched from the worker threads, so the future is polled
+    with `after()` instead of using `add_done_callback`."""
+    def poll():
+        if not widget.winfo_exists():
+            return
+        if future.done():
+            callback(future.result())
+        else:
+            widget.after(interval, poll)
+
+    poll()
+
+
+def report_startup(widget):
+    """Mark the first window as shown and print the timing report once every
+    background resource has finished loading"""
+    timer.mark("first window")
+    pending = [api_client, ticker_list, news_service, coin_names]
+
+    def poll():
+        if all(future.done() for future in pending):
+            timer.mark("all resources loaded")
+            print(timer.report())
+        elif widget.winfo_exists():
+            widget.after(100, poll)
+
+    poll()
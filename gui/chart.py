@@ -0,0 +1,105 @@
+"""Persistent historical data chart, updated in place as tickers are added.
+Imported by the historical data screen when it is first built, not at startup."""
+
+import tkinter
+
+import numpy as np
+import matplotlib.dates
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+from api_client.metrics import get_metrics
+
+
+def minmax_decimate(x, y, n_bins: int):
+    """Reduce a series to the minimum and maximum point of each of `n_bins` equal-sized bins.
+    At one bin per horizontal pixel the line drawn looks the same as the full series."""
+    n = len(y)
+    if n <= 2 * n_bins:
+        return x, y
+
+    bin_size = -(-n // n_bins)
+    padded = np.full(n_bins * bin_size, np.nan)
+    padded[:n] = y
+    bins = padded.reshape(n_bins, bin_size)
+    empty = np.isnan(bins).all(axis=1)
+
+    offsets = np.arange(n_bins) * bin_size
+    i_min = offsets + np.argmin(np.where(np.isnan(bins), np.inf, bins), axis=1)
+    i_max = offsets + np.argmax(np.where(np.isnan(bins), -np.inf, bins), axis=1)
+    keep = np.concatenate(([0], i_min[~empty], i_max[~empty], [n - 1]))
+    keep = np.unique(keep[keep < n])
+    return x[keep], y[keep]
+
+
+class Chart:
+    """A figure embedded once in the screen; every ticker is a Line2D that is added or
+    updated in place. The lines are animated artists blitted over a cached background, so a
+    data update that keeps the axes limits only redraws the lines. Series longer than twice
+    the pixel width of the axes are decimated before being handed to matplotlib."""
+
+    def __init__(self, frame, title="Historical Data Graph", **grid_kwargs) -> None:
+        # a bare Figure: pyplot and its global figure manager are not needed for embedding
+        self.figure = Figure(figsize=(7, 5.5), dpi=100)
+        self.ax = self.figure.add_subplot(111)
+        self.ax.set_title(title)
+        self.ax.xaxis_date()
+        self.lines = {}
+        self._background = None
+        self._legend_changed = False
+
+        self.canvas = FigureCanvasTkAgg(self.figure, frame)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.grid(**grid_kwargs)
+        self.message = tkinter.Label(frame, font=("MS Serif", 15, "bold"))
+
+    @property
+    def pixel_width(self) -> int:
+        """Width of the axes on screen, in pixels"""
+        return max(int(self.ax.bbox.width), 1)
+
+    def _on_draw(self, event):
+        # the full draw skips animated artists: cache it as the background and blit the lines
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
+    def set_series(self, name, dates, values) -> None:
+        """Add the series `name` to the chart or replace its data"""
+        x = matplotlib.dates.date2num(np.asarray(dates, dtype="datetime64[us]"))
+        y = np.asarray(values, dtype=float)
+        x, y = minmax_decimate(x, y, self.pixel_width)
+        if name in self.lines:
+            self.lines[name].set_data(x, y)
+        else:
+            self.lines[name], = self.ax.plot(x, y, label=name, animated=True)
+            self._legend_changed = True
+
+    def show_message(self, text) -> None:
+        self.message.config(text=text)
+        self.message.grid(row=2, column=1)
+        self.message.lift()
+
+    def draw(self) -> None:
+        """Redraw the chart after series changes. Only the lines are blitted, unless the axes
+        limits or the legend changed and the background has to be drawn again."""
+        self.message.grid_forget()
+        old_limits = (self.ax.get_xlim(), self.ax.get_ylim())
+        self.ax.relim()
+        self.ax.autoscale_view()
+        limits_changed = old_limits != (self.ax.get_xlim(), self.ax.get_ylim())
+        metrics = get_metrics()
+        if self._background is None or limits_changed or self._legend_changed:
+            with metrics.span("chart.draw", mode="full"):
+                self.ax.legend(handles=list(self.lines.values()))
+                self._legend_changed = False
+                self.canvas.draw()
+        else:
+            with metrics.span("chart.draw", mode="blit"):
+                self.canvas.restore_region(self._background)
+                self._draw_lines()
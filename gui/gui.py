@@ -1,69 +1,89 @@
 """Module providing screen objects for the application GUI.
 Each screen object must inherit from the Screen class.
-It needs to be supplied with config object and a screen name.
+It needs to be supplied with the screen manager and a screen name.
 Static dependencies for the screens are stored in the './static' dir."""
 
 import tkinter
 import tkinter.font
+import tkinter.ttk
 from tkinter import messagebox
 
 import datetime
 import abc
-import threading
+import collections
+import queue
 
-import tkcalendar
-import pandas_datareader._utils
-import requests.exceptions
-import pandas as pd
-
-from PIL import ImageTk, Image
-from GoogleNews import GoogleNews
-
-from api_client.client import Client
-from api_client.coinmarket_scraper import Scraper
+from api_client.metrics import get_metrics
+from gui import assets
+from gui import bootstrap
 from gui import utils
+from gui.tasks import runner
 
-# ===============================================================
-# SETUP
-
-# setup API client
-api_client = Client()  # will be used to execute user's queries
-
-try:
-    ticker_list = [utils.transform_ticker(tic["ticker"])
-                   for tic in api_client.tickers]
-except Exception as e:
-    print(e)
-    ticker_list = []
+# pandas, matplotlib, tkcalendar and the rest of api_client are imported by the screens
+# that use them when they are first built (or by the bootstrap threads), not at startup
 
-# setup Google News API client
-google_news = GoogleNews(
-    period="7d",
-    lang="en",
-    encode="utf-8"
-)
 
-# get coin names for news scraping
-scraper = Scraper()
-try:
-    coin_names = scraper.scrape_coin_names()
-except Exception as e:
-    print(e)
-    coin_names = []
+class ScreenManager:
+    """Owns the single Tk root of the application.
+    Screens are built once and kept in memory (at most `max_screens` of them, least recently
+    used first out); switching screens only raises the frame of the target screen."""
 
+    def __init__(self, config, max_screens=4):
+        self.config = config
+        self.max_screens = max_screens
+        self.root = tkinter.Tk()
+        self.root.resizable(False, False)
+        self.root.geometry(config["gui"]["GEOM"])
+        self.root.iconbitmap(r"static\window_icon.ico")
+        self.root.grid_rowconfigure(0, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+        self.screens = collections.OrderedDict()
+        self.current = None
+        self.metrics = get_metrics()
+        if self.metrics.enabled:
+            utils.DebugOverlay(self.root, self.metrics,
+                               rows=config["metrics"].getint("overlay_rows"))
+
+    def show(self, screen_cls):
+        # queries of the screen being left are superseded
+        runner.cancel_all()
+        if self.current is not None:
+            self.current.on_hide()
+
+        screen = self.screens.get(screen_cls)
+        if screen is None:
+            with self.metrics.span("gui.build_screen", screen=screen_cls.__name__):
+                screen = screen_cls(self)
+                screen.container.grid(row=0, column=0, sticky="nsew")
+                screen.build()
+            self.screens[screen_cls] = screen
+        self.screens.move_to_end(screen_cls)
+        while len(self.screens) > self.max_screens:
+            _, evicted = self.screens.popitem(last=False)
+            evicted.container.destroy()
+
+        screen.container.tkraise()
+        self.root.title(self.config["gui"]["TITLE"] + " - " + screen.screen_name)
+        self.current = screen
+        if self.metrics.enabled:
+            # Tk lays the widgets out lazily; force it here so that its cost can be measured
+            with self.metrics.span("gui.layout", screen=screen_cls.__name__):
+                self.root.update_idletasks()
+        return screen
 
-# ===============================================================
+    def run(self):
+        runner.pump(self.root)
+        self.root.mainloop()
 
 
 class Screen:
-    def __init__(self, config, screen_name: str):
-        self.original_config = config
-        self.config = config["gui"]
-        self.root = tkinter.Tk(screenName=screen_name)
-        self.root.title(self.config["TITLE"] + " - " + screen_name)
-        self.root.resizable(False, False)
-        self.root.geometry(self.config["GEOM"])
-        self.root.iconbitmap(r"static\window_icon.ico")
+    def __init__(self, manager, screen_name: str):
+        self.manager = manager
+        self.screen_name = screen_name
+        self.original_config = manager.config
+        self.config = self.original_config["gui"]
+        self.root = manager.root
+        self.container = tkinter.Frame(self.root, bg="black")
         self.ticker_var = tkinter.StringVar(self.root)
 
     def get_original_config(self):
@@ -71,14 +91,23 @@ class Screen:
 
     @abc.abstractmethod
     def _build_window(self):
-        """Screen layout goes here"""
+        """Screen layout goes here, inside `self.container`"""
+        ...
+
+    def build(self):
+        self._build_window()
+
+    def refresh(self):
+        """Fetch the data shown on the screen again, keeping the widgets as they are"""
+        ...
+
+    def on_hide(self):
+        """Called when another screen is raised over this one"""
         ...
 
     def _transition(self, new_screen):
-        """Switch to a given screen. Results in destruction of the current screen"""
-        self.root.destroy()
-        new_screen_obj = new_screen(self.original_config)
-        new_screen_obj.run()
+        """Switch to a given screen. The current screen is kept in memory"""
+        self.manager.show(new_screen)
 
     def _add_footer_buttons(self, parent, **kwargs):
         back_button = tkinter.Button(parent, text="Back",
@@ -87,131 +116,167 @@ class Screen:
         back_button.grid(row=kwargs["row"], column=kwargs["col_back"], padx=kwargs["padx"], pady=20)
 
         refresh_button = tkinter.Button(parent, text="Refresh",
-                                        command=lambda: self._transition(self.__class__),
+                                        command=lambda: self.refresh(),
                                         font=(self.config["font"], 15, "bold"), bg='#d4af37')
         refresh_button.grid(row=kwargs["row"], column=kwargs["col_refresh"],
                             padx=kwargs["padx"], pady=20)
 
     def _add_frame_with_background(self, im_path):
-        frame = tkinter.Frame(self.root, padx=20, pady=20, bg="black")
+        frame = tkinter.Frame(self.container, padx=20, pady=20, bg="black")
         frame.pack(expand=True, fill="both")
 
-        background_image = ImageTk.PhotoImage(Image.open(im_path))
-        background_label = tkinter.Label(frame, image=background_image)
-        background_label.image = background_image
+        background_label = tkinter.Label(frame, image=assets.photo(im_path))
         background_label.place(x=0, y=0, relwidth=1, relheight=1)
 
         return frame
 
-    def run(self):
-        self._build_window()
-        self.root.mainloop()
-
 
 class ScreenWithTickers(Screen):
-    def __init__(self, config, screen_name=""):
-        super().__init__(config, screen_name)
+    def __init__(self, manager, screen_name=""):
+        super().__init__(manager, screen_name)
         self.loading_lbl = None
 
     @abc.abstractmethod
     def _build_window(self):
         ...
 
-    def _build_ticker_choice(self, parent, tickers=ticker_list, **kwargs):
+    def _build_ticker_choice(self, parent, tickers=None, **kwargs):
+        """Build the ticker combobox. Its values are filled in once the `tickers` future
+        (the ticker list by default) is done, so the screen itself is shown right away."""
+        if tickers is None:
+            tickers = bootstrap.ticker_list
+        index = None
         ticker_choice = tkinter.ttk.Combobox(parent, textvariable=self.ticker_var,
-                                             values=tickers,
+                                             values=[],
                                              font=(self.config["font"], 15, "bold"))
 
-        def check_input(event):
-            value = event.widget.get()
-
-            if value == '':
-                ticker_choice['values'] = tickers
-            else:
-                data = []
-                for item in tickers:
-                    if value.lower() in item.lower():
-                        data.append(item)
+        def fill_values(result):
+            nonlocal index
+            index = result
+            ticker_choice['values'] = index.search("")
+            self._on_tickers_loaded(index.items)
 
-                ticker_choice['values'] = data
+        def check_input(event):
+            if index is not None:
+                ticker_choice['values'] = index.search(event.widget.get())
 
         ticker_choice.bind('<KeyRelease>', check_input)
         padx = kwargs.pop("padx", 20)
         pady = kwargs.pop("pady", 20)
         ticker_choice.grid(row=0, column=0, padx=padx, pady=pady)
 
+        bootstrap.when_ready(parent, bootstrap.search_index(tickers), fill_values)
+
+    def _on_tickers_loaded(self, tickers):
+        """Hook called on the main loop once the ticker choice has been filled"""
+        ...
+
+    def _show_loading(self, parent, **grid_kwargs):
+        """Show the loading gif, replacing the one of a superseded query if still shown"""
+        self._hide_loading()
+        self.loading_lbl = utils.ImageLabel(parent)
+        self.loading_lbl.grid(**grid_kwargs)
+        self.loading_lbl.load(r'static\loading.gif')
+
+    def _hide_loading(self):
+        if self.loading_lbl is not None:
+            self.loading_lbl.unload()
+            self.loading_lbl.destroy()
+            self.loading_lbl = None
+
+    def _task_failed(self, error):
+        """`on_error` of the runner tasks: stop the loading gif and report the error"""
+        self._hide_loading()
+        messagebox.showerror("Query failed", f"{type(error).__name__}: {error}")
+
+    def on_hide(self):
+        # the pending query is cancelled when the screen is left
+        self._hide_loading()
+
 
 class StartScreen(Screen):
 
-    def __init__(self, config) -> None:
-        super().__init__(config, screen_name="home")
+    def __init__(self, manager) -> None:
+        super().__init__(manager, screen_name="home")
 
     def _build_window(self):
-        frame = tkinter.Frame(self.root, pady=20, bg="black")
+        frame = tkinter.Frame(self.container, pady=20, bg="black")
         frame.pack(fill="both", expand=True)
         welcome_label = tkinter.Label(frame, text="Welcome to Crypto App!",
                                       font=(self.config["font"], 20, "bold"), fg="#d4af37",
                                       bg="black")
-        welcome_label.grid(row=0, column=0, columnspan=3)
+        welcome_label.grid(row=0, column=0, columnspan=4)
 
         im_frame = tkinter.Frame(frame, padx=5, pady=10, bg="black")
-        im_frame.grid(row=1, column=0, sticky="", columnspan=3)
-
-        im_obj = Image.open(r"static\title_page.jpg")
+        im_frame.grid(row=1, column=0, sticky="", columnspan=4)
 
-        im_obj = im_obj.resize((1000, 600))
-        image = ImageTk.PhotoImage(im_obj)
+        image = assets.photo(r"static\title_page.jpg", (1000, 600))
         img_label = tkinter.Label(im_frame, image=image)
-        img_label.image = image
         img_label.pack()
 
         start_button = tkinter.Button(frame, text="Spot quotes",
                                       name="daily_close",
                                       command=lambda: self._transition(SpotQuotes),
-                                      width=20,
+                                      width=15,
                                       pady=20,
                                       font=(self.config["font"], 15, "bold"),
                                       bg='#d4af37')
         start_button.grid(row=2, column=0)
-        btn1 = tkinter.Button(frame, text="Crypto news", width=20,
+        btn1 = tkinter.Button(frame, text="Crypto news", width=15,
                               pady=20,
                               font=(self.config["font"], 15, "bold"),
                               bg='#d4af37',
                               command=lambda: self._transition(CryptoNews))
-        btn2 = tkinter.Button(frame, text="Historical data", width=20,
+        btn2 = tkinter.Button(frame, text="Historical data", width=15,
                               pady=20,
                               font=(self.config["font"], 15, "bold"),
                               bg='#d4af37',
                               command=lambda: self._transition(HistoricalQuotes))
+        btn3 = tkinter.Button(frame, text="Portfolio", width=15,
+                              pady=20,
+                              font=(self.config["font"], 15, "bold"),
+                              bg='#d4af37',
+                              command=lambda: self._transition(Holdings))
         btn1.grid(row=2, column=1)
         btn2.grid(row=2, column=2)
+        btn3.grid(row=2, column=3)
 
 
 class SpotQuotes(ScreenWithTickers):
 
-    def __init__(self, config, screen_name="spot quotes") -> None:
-        super().__init__(config, screen_name)
+    def __init__(self, manager, screen_name="spot quotes") -> None:
+        super().__init__(manager, screen_name)
         self.adjusted_var = tkinter.StringVar(self.root)
         self.adjusted_var.set("adjusted")  # default option
-
-        if not ticker_list:
+        self.poller = None
+        self.live_changes = queue.Queue()
+        self.live_table = None
+        self.live_button = None
+        self.frame = None
+        self.date_entry = None
+        self.last_query = None
+
+    def _on_tickers_loaded(self, tickers):
+        if not tickers:
             self.ticker_var.set("Failed to load tickers")
-            tkinter.Label(self.root, text="No internet connection!",
+            tkinter.Label(self.container, text="No internet connection!",
                           font=(self.config["font"], 15, "bold")).pack()
 
     def _build_window(self):
+        import tkcalendar
+
         padx = 20
-        frame = self._add_frame_with_background(r"static\background.jpg")
+        frame = self.frame = self._add_frame_with_background(r"static\background.jpg")
 
         self._build_ticker_choice(frame, padx=20)
 
-        date_entry = tkcalendar.DateEntry(frame,
-                                          width=30,
-                                          bg="darkblue",
-                                          fg="white",
-                                          year=datetime.date.today().year,
-                                          font=(self.config["font"], 15, "bold"))
-        date_entry.grid(row=0, column=1, padx=padx, pady=20)
+        self.date_entry = tkcalendar.DateEntry(frame,
+                                               width=30,
+                                               bg="darkblue",
+                                               fg="white",
+                                               year=datetime.date.today().year,
+                                               font=(self.config["font"], 15, "bold"))
+        self.date_entry.grid(row=0, column=1, padx=padx, pady=20)
 
         adjusted_choice = tkinter.ttk.Combobox(frame, textvariable=self.adjusted_var,
                                                values=["adjusted", "not adjusted"],
@@ -226,117 +291,264 @@ class SpotQuotes(ScreenWithTickers):
 
         search_button.grid(row=1, column=1, padx=padx, pady=60)
 
+        # ===========================================================================
+        # Live quotes of the watchlist
+        # ===========================================================================
+        self.live_button = tkinter.Button(frame, text="Live quotes",
+                                          command=lambda: self.toggle_live(),
+                                          font=(self.config["font"], 15, "bold"), bg='#d4af37')
+        self.live_button.grid(row=1, column=0, padx=padx, pady=60)
+
+        self.live_table = tkinter.ttk.Treeview(frame, columns=("price",), height=6)
+        self.live_table.heading("#0", text="Ticker")
+        self.live_table.heading("price", text="Last price")
+        self.live_table.grid(row=4, column=0, columnspan=3, padx=padx)
+        self.live_table.bind("<Destroy>", lambda event: self.poller and self.poller.stop())
+
         self._add_footer_buttons(frame, padx=20, row=3, col_refresh=2, col_back=0)
 
-    def _get_quote(self, ticker, date, out_label):
+    def toggle_live(self):
+        """Start or stop polling the watchlist (and the chosen ticker) for live prices"""
+        if self.poller is not None and self.poller.running:
+            self.poller.stop()
+            self.live_button.config(text="Live quotes")
+            return
+
+        if not bootstrap.api_client.done():
+            messagebox.showinfo("Live quotes", "The API client is still loading, try again shortly")
+            return
+        api_client = bootstrap.api_client.result()
+        if self.poller is None:
+            from api_client.live import QuotePoller
+
+            self.poller = QuotePoller(api_client,
+                                      self.original_config["live"].getfloat("interval"),
+                                      self.live_changes.put)
+        watchlist = [ticker.strip().lower() for ticker in self.config["watchlist"].split(",")]
+        if self.ticker_var.get() in api_client.registry:
+            watchlist.append(self.ticker_var.get().lower())
+        for ticker in watchlist:
+            if not self.live_table.exists(ticker):
+                self.live_table.insert("", "end", iid=ticker, text=ticker.upper(), values=("...",))
+        self.poller.watch(watchlist)
+        self.poller.start()
+        self.live_button.config(text="Stop live")
+        self._apply_live_changes()
+
+    def _apply_live_changes(self):
+        """Move the rows changed by the poller thread into the table, on the Tk main loop"""
+        if not self.live_table.winfo_exists():
+            return
+        while not self.live_changes.empty():
+            for ticker, price in self.live_changes.get_nowait().items():
+                self.live_table.set(ticker, "price", f"{price:,.4f}")
+        if self.poller.running:
+            self.root.after(200, self._apply_live_changes)
+
+    @staticmethod
+    def _get_quote(ticker, date, adjusted):
+        """Runs on the task loop, returns the text to show"""
+        import requests.exceptions
+
         try:
-            close = api_client.get_daily_open_close(ticker, date, str(self.adjusted_var))
+            api_client = bootstrap.api_client.result()
+            close = api_client.get_daily_open_close(ticker, date, adjusted)
             text = f"Closing price for {ticker.upper()}:\n {close}"
         except KeyError:
             text = f"No data for {date.strftime('%Y-%m-%d')}"
-        except pandas_datareader._utils.RemoteDataError:
-            text = f"No data fetched for symbol {ticker}\n using YahooDailyReader"
-        except requests.exceptions.ConnectionError:
+        except requests.exceptions.RequestException:
             text = "Query failed. \nPlease check your network connection and try again."
+        except IOError:
+            # pandas_datareader's RemoteDataError
+            text = f"No data fetched for symbol {ticker}\n using YahooDailyReader"
+        return text
 
-        self.loading_lbl.unload()
-        self.loading_lbl.destroy()
+    def _show_quote(self, text, out_label):
+        self._hide_loading()
         out_label.config(text=text)
 
-    def get_daily_open_close(self):
-        frame = self.root.children["!frame"]
-        date = datetime.datetime.strptime(frame.children["!dateentry"].get(), "%m/%d/%y")
-        ticker = self.ticker_var.get().lower()
-        self.loading_lbl = utils.ImageLabel(frame)
-        self.loading_lbl.grid(row=2, column=1, pady=60)
-        self.loading_lbl.load(r'static\loading.gif')
+    def _quote_failed(self, error, out_label):
+        self._task_failed(error)
+        out_label.config(text="Query failed.")
+
+    def get_daily_open_close(self, query=None):
+        frame = self.frame
+        if query is None:
+            date = datetime.datetime.strptime(self.date_entry.get(), "%m/%d/%y")
+            query = (self.ticker_var.get().lower(), date, self.adjusted_var.get())
+        self.last_query = query
+        self._show_loading(frame, row=2, column=1, pady=60)
         result_label = tkinter.Label(frame, name="close_price", font=(self.config["font"], 15, "bold"),
                                      text="waiting for the query to complete...")
         result_label.grid(row=2, column=1, pady=60)
-        self.root.update()
 
-        thread = threading.Thread(target=self._get_quote, args=(ticker, date, result_label))
-        thread.start()
+        runner.submit("quote", self._get_quote, *query,
+                      on_done=lambda text: self._show_quote(text, result_label),
+                      on_error=lambda error: self._quote_failed(error, result_label))
+
+    def refresh(self):
+        if self.last_query is not None:
+            self.get_daily_open_close(self.last_query)
 
 
 class HistoricalQuotes(ScreenWithTickers):
-    def __init__(self, config, screen_name="historical quotes") -> None:
-        super().__init__(config, screen_name)
+    def __init__(self, manager, screen_name="historical quotes") -> None:
+        super().__init__(manager, screen_name)
+        from api_client import export
+        from api_client.analytics import METRICS, PanelAnalytics
+        from api_client.panel import Panel
+
         self.res_container = {"result": None}
-        self.export_formats = ["csv", "xlsx", "json", "html"]
+        self.export_formats = export.FORMATS
+        self.export_progress = None
         self.export_format_var = tkinter.StringVar(self.root)
         self.export_format_var.set(self.export_formats[0])
         self.chosen_tickers = []
-        self.table = pd.DataFrame()
-
-    def _get_table(self, ticker, start_date, end_date, frame):
-        graph = True
-        if ticker in self.chosen_tickers:
-            graph = False
-        else:
-
-            self.chosen_tickers.append(ticker)
-            try:
-                table = api_client.get_hist_data(ticker, start_date, end_date)
-                if self.table.empty:
-                    self.table = table
-                else:
-                    self.table = pd.concat([self.table, table], axis=1)
-
-            except pandas_datareader._utils.RemoteDataError:
-                pass
-
-        self.loading_lbl.unload()
-        self.loading_lbl.destroy()
-        if graph:
-            utils.build_chart(frame, ticker, self.table, legend=self.chosen_tickers)
-
-    def run_process(self):
-        frame = self.root.children["!frame"]
-
-        start_date = datetime.datetime.strptime(frame.children["!dateentry"].get(), "%m/%d/%y")
-        end_date = datetime.datetime.strptime(frame.children["!dateentry2"].get(), "%m/%d/%y")
-        ticker = self.ticker_var.get().lower()
-        self.loading_lbl = utils.ImageLabel(frame)
-        self.loading_lbl.grid(row=2, column=1)
-        self.loading_lbl.load(r'static\loading.gif')
-
-        self.root.update()
+        self.panel = Panel(dtype=self.config["panel_dtype"])
+        analytics_config = self.original_config["analytics"]
+        self.analytics = PanelAnalytics(self.panel, window=analytics_config.getint("window"),
+                                        periods_per_year=analytics_config.getint(
+                                            "periods_per_year"))
+        self.metrics = ("Close",) + METRICS
+        self.metric_var = tkinter.StringVar(self.root)
+        self.metric_var.set(self.metrics[0])
+        self.export_analytics_var = tkinter.BooleanVar(self.root)
+        self.chart = None
+        self.frame = None
+        self.start_date_entry = None
+        self.end_date_entry = None
+        self.date_range = None
+        self.export_job = None
+        # resolution of the bars in the panel, picked for the range when it is first filled
+        self.resolution = None
+
+    def _get_table(self, tickers, start_date, end_date, resolution=None, pixels=None):
+        """Runs on the task loop: fetch the tickers (all of them at once) into a new Panel.
+        Without a `resolution`, the coarsest one that fills `pixels` is used.
+        Returns the resolution actually served and the panel."""
+        api_client = bootstrap.api_client.result()
+        if resolution is None:
+            resolution = api_client.resolution_for(start_date, end_date, pixels)
+        return api_client.get_chart_data(tickers, start_date, end_date, resolution,
+                                         dtype=self.panel.dtype)
+
+    def _submit_fetch(self, tickers, frame):
+        pixels = self.chart.pixel_width if self.chart is not None else None
+        resolution = None if self.panel.empty else self.resolution
+        runner.submit("history", self._get_table, tickers, *self.date_range, resolution, pixels,
+                      on_done=lambda result: self._show_table(tickers, *result, frame),
+                      on_error=self._task_failed)
+
+    def _show_table(self, new_tickers, resolution, fetched, frame):
+        """Merge the fetched tickers into the panel and redraw, on the Tk main loop"""
+        from api_client.resample import PERIODS_PER_YEAR
+
+        if self.export_job is not None and not self.export_job.done:
+            # the running export reads the panel block by block: merge once it is written
+            self.root.after(200, self._show_table, new_tickers, resolution, fetched, frame)
+            return
+        self._hide_loading()
+        if self.panel.empty:
+            self.resolution = resolution
+            self.analytics.periods_per_year = PERIODS_PER_YEAR[resolution]
+        elif resolution != self.resolution:
+            # hourly bars were not available for the new tickers: never mix resolutions
+            from api_client.panel import Panel
+
+            fetched = Panel(dtype=self.panel.dtype)
+        self.panel.merge(fetched)
+        self.analytics.update()
+        self.chosen_tickers.extend(ticker for ticker in fetched.tickers
+                                   if ticker not in self.chosen_tickers)
+
+        if self.chart is None:
+            from gui.chart import Chart
+
+            self.chart = Chart(frame, row=2, column=0, columnspan=3)
+        self._plot_metric()
+        if not fetched.tickers:
+            self.chart.show_message(f"Could not load data for {', '.join(new_tickers)}")
+
+    def _plot_metric(self):
+        """Draw the chosen metric of every ticker; the shared index may have grown, so every
+        line is realigned to it"""
+        if self.chart is None or self.panel.empty:
+            return
+        metric = self.metric_var.get()
+        for ticker in self.panel.tickers:
+            if metric == "Close":
+                values = self.panel.series("Close", ticker)
+            else:
+                values = self.analytics.series(metric, ticker)
+            self.chart.set_series(ticker, self.panel.index, values)
+        self.chart.draw()
+
+    def run_process(self, tickers=None):
+        frame = self.frame
+
+        start_date = datetime.datetime.strptime(self.start_date_entry.get(), "%m/%d/%y")
+        end_date = datetime.datetime.strptime(self.end_date_entry.get(), "%m/%d/%y")
+        self.date_range = (start_date, end_date)
+        if tickers is None:
+            tickers = [self.ticker_var.get().lower()]
+        new_tickers = [ticker for ticker in tickers if ticker not in self.chosen_tickers]
+        if not new_tickers:
+            return
+        self._show_loading(frame, row=2, column=1)
+        self._submit_fetch(new_tickers, frame)
 
-        thread = threading.Thread(target=self._get_table,
-                                  args=(ticker, start_date, end_date, frame))
-        thread.start()
+    def refresh(self):
+        if not self.chosen_tickers:
+            return
+        self._show_loading(self.frame, row=2, column=1)
+        self._submit_fetch(list(self.chosen_tickers), self.frame)
 
     def export_to_excel(self):
         exp_format = self.export_format_var.get()
         file_root = "&".join(self.chosen_tickers)
-        file_name = f"{file_root}_historical_data" + "." + exp_format
-        if self.table.empty:
+        file_name = f"{file_root}_historical_data_{self.resolution}" + "." + exp_format
+        if self.panel.empty:
             messagebox.showerror("Error", "No data to export")
             return
+        if exp_format not in self.export_formats:
+            messagebox.showerror("Invalid export format", f"Export format '{exp_format}' "
+                                                          f"not recoginzed.")
+            return
 
-        if exp_format == "csv":
-            self.table.to_csv(file_name)
-
-        elif exp_format == "xlsx":
-            self.table.to_excel(file_name)
-
-        elif exp_format == "json":
-            self.table.to_json(file_name)
-
-        elif exp_format == "html":
-            self.table.to_html(file_name)
+        from api_client import export
 
+        # the rows are built block by block on the export thread, never all at once
+        if self.export_analytics_var.get():
+            table = export.LazyTable(
+                lambda rows: self.analytics.to_frame(with_fields=True, rows=rows),
+                len(self.panel.index))
         else:
-            messagebox.showerror("Invalid export format", f"Export format '{exp_format}' "
-                                                          f"not recoginzed.")
+            table = export.LazyTable(self.panel.to_frame, len(self.panel.index))
+        job = self.export_job = export.ExportJob(table, file_name, exp_format).start()
+        self.export_progress.grid(row=4, column=1, columnspan=2, padx=10, sticky="ew")
+        self._watch_export(job)
+
+    def _watch_export(self, job):
+        """Report the progress of a background export job on the Tk main loop"""
+        if not self.export_progress.winfo_exists():
             return
-        messagebox.showinfo("Export complete", "Data successfully exported")
+        self.export_progress["value"] = job.fraction * 100
+        if not job.done:
+            self.root.after(100, self._watch_export, job)
+            return
+
+        self.export_progress.grid_forget()
+        if job.error is not None:
+            messagebox.showerror("Export failed", str(job.error))
+        else:
+            messagebox.showinfo("Export complete", "Data successfully exported")
 
     def _build_window(self):
+        import tkcalendar
+
         padx = 10
 
-        frame = self._add_frame_with_background(r"static\background.jpg")
+        frame = self.frame = self._add_frame_with_background(r"static\background.jpg")
 
         # ===========================================================================
         # Input controls
@@ -350,6 +562,7 @@ class HistoricalQuotes(ScreenWithTickers):
                                                 year=datetime.date.today().year,
                                                 font=(self.config["font"], 15, "bold"))
         start_date_entry.grid(row=0, column=1, padx=padx, pady=20)
+        self.start_date_entry = start_date_entry
 
         end_date_entry = tkcalendar.DateEntry(frame,
                                               width=20,
@@ -358,6 +571,7 @@ class HistoricalQuotes(ScreenWithTickers):
                                               year=datetime.date.today().year,
                                               font=(self.config["font"], 15, "bold"))
         end_date_entry.grid(row=0, column=2, padx=padx, pady=20)
+        self.end_date_entry = end_date_entry
 
         # ===========================================================================
         # Fetch data and draw graph
@@ -370,6 +584,29 @@ class HistoricalQuotes(ScreenWithTickers):
                                     font=(self.config["font"], 15, "bold"), bg='#d4af37')
         run_button.grid(row=0, column=3, padx=padx, pady=20)
 
+        watchlist = [ticker.strip().lower() for ticker in self.config["watchlist"].split(",")]
+        watchlist_button = tkinter.Button(frame, text="Watchlist",
+                                          command=lambda: self.run_process(watchlist)
+                                          or start_date_entry.config(state="disabled")
+                                          or end_date_entry.config(state="disabled"),
+                                          font=(self.config["font"], 15, "bold"), bg='#d4af37')
+        watchlist_button.grid(row=1, column=3, padx=padx, pady=20)
+
+        # ===========================================================================
+        # Analytics shown on the graph and included in the export
+        # ===========================================================================
+        metric_choice = tkinter.ttk.Combobox(frame, textvariable=self.metric_var,
+                                             values=self.metrics,
+                                             width=15,
+                                             state="readonly",
+                                             font=(self.config["font"], 15, "bold"))
+        metric_choice.bind("<<ComboboxSelected>>", lambda event: self._plot_metric())
+        metric_choice.grid(row=1, column=1, padx=padx, pady=20)
+        analytics_check = tkinter.Checkbutton(frame, text="Export analytics",
+                                              variable=self.export_analytics_var,
+                                              font=(self.config["font"], 12, "bold"))
+        analytics_check.grid(row=1, column=2, padx=padx, pady=20)
+
         # ===========================================================================
         # Export data to excel
         # ===========================================================================
@@ -383,79 +620,314 @@ class HistoricalQuotes(ScreenWithTickers):
                                      command=lambda: self.export_to_excel(),
                                      font=(self.config["font"], 15, "bold"), bg='#d4af37')
         save_button.grid(row=3, column=2, padx=padx, pady=20)
+        self.export_progress = tkinter.ttk.Progressbar(frame, mode="determinate", maximum=100)
 
         self._add_footer_buttons(frame, padx=20, row=3, col_back=0, col_refresh=3)
 
 
 class CryptoNews(ScreenWithTickers):
-    def __init__(self, config, screen_name="crypto_news") -> None:
-        super().__init__(config, screen_name)
-        self.ticker_var.set(coin_names[0])
+    def __init__(self, manager, screen_name="crypto_news") -> None:
+        super().__init__(manager, screen_name)
+        self.news_list = None
         self.news_frame = None
+        self.last_coin = None
+
+    def _on_tickers_loaded(self, tickers):
+        if tickers:
+            self.ticker_var.set(tickers[0])
+
+    def search_news(self, coin=None, use_cache=True):
+        if coin is None:
+            coin = self.ticker_var.get()
+        self.last_coin = coin
+        news_service = bootstrap.news_service.result()
+        cached = news_service.cached(coin) if use_cache else None
+        if cached is not None:
+            self._show_news(cached)
+            return
+        self._show_loading(self.news_frame, row=2, column=1, pady=60)
 
-    def search_news(self, frame):
-        self.loading_lbl = utils.ImageLabel(frame)
-        self.loading_lbl.grid(row=2, column=1, pady=60)
-        self.loading_lbl.load(r'static\loading.gif')
+        runner.submit("news", self._search, news_service, coin, use_cache,
+                      on_done=self._show_news, on_error=self._task_failed)
+
+    @staticmethod
+    async def _search(news_service, coin, use_cache):
+        """Runs on the task loop: waits for the search running on the NewsService pool
+        without holding a runner thread"""
+        import asyncio
 
-        thread = threading.Thread(target=self._search_news, args=(frame,))
-        thread.start()
+        # shielded, so that a superseded query does not cancel a search other callers share
+        return await asyncio.shield(asyncio.wrap_future(news_service.submit(coin, use_cache)))
 
-    def _search_news(self, frame):
-        if self.news_frame is not None:
-            self.news_frame.destroy()
-            frame.update()
-        self.news_frame = tkinter.Frame(frame, width=10)
-        self.news_frame.pack_propagate(0)
-        self.news_frame.grid(row=1, column=0)
+    def refresh(self):
+        if self.last_coin is not None:
+            self.search_news(self.last_coin, use_cache=False)
 
-        ticker = self.ticker_var.get()
-        google_news.search(ticker)
-        news = google_news.result()
-        google_news.clear()
+    def _prefetch_watchlist(self, news_service):
+        watchlist = [coin.strip() for coin in self.original_config["news"]["watchlist"].split(",")]
+        news_service.prefetch(watchlist)
 
+    def _show_news(self, news):
         # destroy loading gif
-        self.loading_lbl.unload()
-        self.loading_lbl.destroy()
-
-        row = 0
-        for news_piece in news[:5]:
-            news_frame = tkinter.Frame(self.news_frame, borderwidth=2, padx=10)
-            news_frame.grid(row=row, column=0, sticky=tkinter.W)
-            tkinter.Label(news_frame,
-                          text="[" + news_piece["date"] + "]" + "  " + news_piece["title"],
-                          justify=tkinter.LEFT,
-                          font=("Times New Roman", 12, "bold"),
-                          padx=10, pady=10).grid(row=0, column=0, columnspan=1, sticky=tkinter.W)
-            tkinter.Label(news_frame, text=news_piece["desc"],
-                          justify=tkinter.LEFT,
-                          padx=10, pady=10).grid(row=1, column=0, columnspan=2, sticky=tkinter.W)
-            url = tkinter.Label(news_frame, text=news_piece["link"],
-                                justify=tkinter.LEFT,
-                                padx=10, fg="blue")
-            url.grid(row=2, column=0, columnspan=3, sticky=tkinter.W)
-
-            def make_lambda_click():
-                link = news_piece["link"]
-                return lambda x: utils.open_url(link)
-
-            url.bind("<Button-1>", make_lambda_click())
-
-            frame.update()
-            row += 1
+        self._hide_loading()
+        self.news_list.set_items(news)
+
+    @staticmethod
+    def _build_news_row(parent):
+        news_frame = tkinter.Frame(parent, borderwidth=2, padx=10)
+        news_frame.title_lbl = tkinter.Label(news_frame,
+                                             justify=tkinter.LEFT,
+                                             font=("Times New Roman", 12, "bold"),
+                                             padx=10, pady=10)
+        news_frame.title_lbl.grid(row=0, column=0, columnspan=1, sticky=tkinter.W)
+        news_frame.desc_lbl = tkinter.Label(news_frame, justify=tkinter.LEFT, padx=10, pady=10)
+        news_frame.desc_lbl.grid(row=1, column=0, columnspan=2, sticky=tkinter.W)
+        news_frame.url_lbl = tkinter.Label(news_frame, justify=tkinter.LEFT, padx=10, fg="blue")
+        news_frame.url_lbl.grid(row=2, column=0, columnspan=3, sticky=tkinter.W)
+        news_frame.url_lbl.bind("<Button-1>", lambda event: utils.open_url(event.widget["text"]))
+        return news_frame
+
+    @staticmethod
+    def _fill_news_row(news_frame, news_piece):
+        news_frame.title_lbl.config(text="[" + news_piece["date"] + "]" + "  " + news_piece["title"])
+        news_frame.desc_lbl.config(text=news_piece["desc"])
+        news_frame.url_lbl.config(text=news_piece["link"])
 
     def _build_window(self):
         frame = self._add_frame_with_background(r"static\background2.jpg")
-        news_frame = tkinter.Frame(self.root)
+        news_frame = self.news_frame = tkinter.Frame(self.container)
         news_frame.pack(expand=True, fill='both')
-        self._build_ticker_choice(frame, coin_names, padx=20)
+        self.news_list = utils.VirtualList(news_frame, 5, self._build_news_row, self._fill_news_row)
+        self.news_list.grid(row=1, column=0, sticky=tkinter.W)
+        self._build_ticker_choice(frame, bootstrap.coin_names, padx=20)
         search_button = tkinter.Button(
             frame,
             text="Search News",
-            command=lambda: self.search_news(news_frame),
+            command=lambda: self.search_news(),
             font=(self.config["font"], 15, "bold"),
             bg='#d4af37',
         )
         search_button.grid(row=0, column=2, padx=40)
+        bootstrap.when_ready(frame, bootstrap.news_service, self._prefetch_watchlist)
 
         self._add_footer_buttons(frame, row=0, col_back=4, padx=20, col_refresh=5)
+
+
+class Holdings(ScreenWithTickers):
+    def __init__(self, manager, screen_name="portfolio") -> None:
+        super().__init__(manager, screen_name)
+        from api_client.portfolio import Portfolio, Valuation
+
+        self.portfolio = Portfolio(self.original_config["portfolio"]["path"])
+        self.load_error = None
+        try:
+            self.portfolio.load()
+        except ValueError as e:
+            # the unreadable file is left alone: no lot can be added until it is fixed
+            self.load_error = e
+        self.valuation = Valuation(self.portfolio)
+        self.quantity_var = tkinter.StringVar(self.root)
+        self.price_var = tkinter.StringVar(self.root)
+        self.poller = None
+        self.live_changes = queue.Queue()
+        self.table = None
+        self.totals_label = None
+        self.live_button = None
+        self.date_entry = None
+        self.frame = None
+
+    # ===========================================================================
+    # Positions table
+    # ===========================================================================
+    def _format_row(self, ticker):
+        formats = (",.6g", ",.4f", ",.2f", ",.2f", ",.2f", ",.2f", ".1%")
+        # positions without a price yet are shown as pending
+        return tuple("..." if value != value else format(value, spec)
+                     for value, spec in zip(self.valuation.row(ticker), formats))
+
+    def _show_totals(self):
+        self.totals_label.config(text="    ".join(
+            f"{name}: {value:,.2f}" for name, value in self.valuation.totals().items()))
+
+    def _fill_table(self):
+        self.table.delete(*self.table.get_children())
+        for ticker in self.valuation.tickers:
+            self.table.insert("", "end", iid=ticker, text=ticker, values=self._format_row(ticker))
+        self._show_totals()
+
+    def _update_rows(self, tickers):
+        """Rewrite the rows of the repriced `tickers`; the allocation of every row moves
+        with the total value"""
+        if not tickers or not self.table.winfo_exists():
+            return
+        for ticker in tickers:
+            self.table.item(ticker, values=self._format_row(ticker))
+        for ticker, allocation in zip(self.valuation.tickers, self.valuation.allocation):
+            self.table.set(ticker, "Allocation",
+                           "..." if allocation != allocation else f"{allocation:.1%}")
+        self._show_totals()
+
+    # ===========================================================================
+    # Lots and prices
+    # ===========================================================================
+    def add_lot(self):
+        if self.load_error is not None:
+            messagebox.showerror("Portfolio", str(self.load_error))
+            return
+        if not bootstrap.api_client.done():
+            messagebox.showinfo("Portfolio", "The API client is still loading, try again shortly")
+            return
+        # tickers are recorded in one notation, and unknown ones are rejected
+        self.portfolio.registry = bootstrap.api_client.result().registry
+        date = datetime.datetime.strptime(self.date_entry.get(), "%m/%d/%y").date()
+        try:
+            lot = self.portfolio.add(self.ticker_var.get(), float(self.quantity_var.get()),
+                                     float(self.price_var.get()), date)
+        except ValueError as e:
+            messagebox.showerror("Invalid lot", str(e))
+            return
+        self.portfolio.save()
+        self.valuation.rebuild()
+        self._fill_table()
+        if self.poller is not None and self.poller.running:
+            self.poller.watch([lot.ticker])
+        self.refresh()
+
+    @staticmethod
+    def _fetch_prices(valuation):
+        """Runs on the task loop: the last prices of every open position at once"""
+        return valuation.fetch_prices(bootstrap.api_client.result())
+
+    def _apply_prices(self, prices):
+        self._hide_loading()
+        self._update_rows(self.valuation.update_prices(prices))
+
+    def refresh(self):
+        if not self.valuation.open_tickers:
+            return
+        self._show_loading(self.frame, row=3, column=3)
+        runner.submit("portfolio", self._fetch_prices, self.valuation,
+                      on_done=self._apply_prices, on_error=self._task_failed)
+
+    def toggle_live(self):
+        """Start or stop polling the open positions for live prices"""
+        if self.poller is not None and self.poller.running:
+            self.poller.stop()
+            self.live_button.config(text="Live prices")
+            return
+
+        if not bootstrap.api_client.done():
+            messagebox.showinfo("Live prices", "The API client is still loading, try again shortly")
+            return
+        if self.poller is None:
+            from api_client.live import QuotePoller
+
+            self.poller = QuotePoller(bootstrap.api_client.result(),
+                                      self.original_config["live"].getfloat("interval"),
+                                      self.live_changes.put)
+        self.poller.watch(self.valuation.open_tickers)
+        self.poller.start()
+        self.live_button.config(text="Stop live")
+        self._apply_live_changes()
+
+    def _apply_live_changes(self):
+        """Reprice the positions changed by the poller thread, on the Tk main loop"""
+        if not self.table.winfo_exists():
+            return
+        while not self.live_changes.empty():
+            self._update_rows(self.valuation.update_prices(self.live_changes.get_nowait()))
+        if self.poller.running:
+            self.root.after(200, self._apply_live_changes)
+
+    # ===========================================================================
+    # Value and P&L history
+    # ===========================================================================
+    @staticmethod
+    def _get_history(tickers, start_date, end_date):
+        """Runs on the task loop: daily bars of the traded tickers"""
+        return bootstrap.api_client.result().get_hist_data_many(tickers, start_date, end_date)
+
+    def _show_history(self, panel):
+        self._hide_loading()
+        from gui.chart import Chart
+
+        window = tkinter.Toplevel(self.root)
+        window.title(self.config["TITLE"] + " - portfolio history")
+        chart = Chart(window, title="Portfolio value", row=0, column=0)
+        if panel.empty:
+            chart.show_message("Could not load the price history")
+            return
+        summary, _ = self.valuation.history(panel)
+        for name in ("Value", "Invested", "P&L"):
+            chart.set_series(name, summary.index, summary[name].to_numpy())
+        chart.draw()
+
+    def show_history(self):
+        if not self.portfolio.lots:
+            messagebox.showinfo("Portfolio history", "No lots recorded yet")
+            return
+        end_date = datetime.date.today()
+        start_date = end_date - datetime.timedelta(
+            days=self.original_config["portfolio"].getint("history_days"))
+        self._show_loading(self.frame, row=3, column=3)
+        runner.submit("portfolio history", self._get_history, self.portfolio.tickers,
+                      start_date, end_date, on_done=self._show_history,
+                      on_error=self._task_failed)
+
+    def _build_window(self):
+        import tkcalendar
+        from api_client.portfolio import Valuation
+
+        padx = 10
+        frame = self.frame = self._add_frame_with_background(r"static\background.jpg")
+
+        # ===========================================================================
+        # New lot: ticker, quantity (negative for a sale), unit price and date
+        # ===========================================================================
+        self._build_ticker_choice(frame, padx=padx)
+        quantity_entry = tkinter.Entry(frame, textvariable=self.quantity_var, width=12,
+                                       font=(self.config["font"], 15, "bold"))
+        quantity_entry.grid(row=0, column=1, padx=padx, pady=20)
+        price_entry = tkinter.Entry(frame, textvariable=self.price_var, width=12,
+                                    font=(self.config["font"], 15, "bold"))
+        price_entry.grid(row=0, column=2, padx=padx, pady=20)
+        self.date_entry = tkcalendar.DateEntry(frame,
+                                               width=12,
+                                               bg="darkblue",
+                                               fg="white",
+                                               year=datetime.date.today().year,
+                                               font=(self.config["font"], 15, "bold"))
+        self.date_entry.grid(row=0, column=3, padx=padx, pady=20)
+
+        add_button = tkinter.Button(frame, text="Add lot",
+                                    command=lambda: self.add_lot(),
+                                    font=(self.config["font"], 15, "bold"), bg='#d4af37')
+        add_button.grid(row=1, column=0, padx=padx, pady=20)
+        self.live_button = tkinter.Button(frame, text="Live prices",
+                                          command=lambda: self.toggle_live(),
+                                          font=(self.config["font"], 15, "bold"), bg='#d4af37')
+        self.live_button.grid(row=1, column=1, padx=padx, pady=20)
+        history_button = tkinter.Button(frame, text="History",
+                                        command=lambda: self.show_history(),
+                                        font=(self.config["font"], 15, "bold"), bg='#d4af37')
+        history_button.grid(row=1, column=2, padx=padx, pady=20)
+
+        # ===========================================================================
+        # Positions valued at the last prices
+        # ===========================================================================
+        self.table = tkinter.ttk.Treeview(frame, columns=Valuation.COLUMNS, height=12)
+        self.table.heading("#0", text="Ticker")
+        self.table.column("#0", width=110)
+        for column in Valuation.COLUMNS:
+            self.table.heading(column, text=column)
+            self.table.column(column, width=110, anchor="e")
+        self.table.grid(row=2, column=0, columnspan=4, padx=padx)
+        self.table.bind("<Destroy>", lambda event: self.poller and self.poller.stop())
+        self.totals_label = tkinter.Label(frame, font=(self.config["font"], 12, "bold"))
+        self.totals_label.grid(row=3, column=0, columnspan=3, padx=padx, pady=10)
+
+        self._add_footer_buttons(frame, padx=20, row=4, col_back=0, col_refresh=3)
+        self._fill_table()
+        if self.load_error is not None:
+            messagebox.showerror("Portfolio", str(self.load_error))
+        self.refresh()
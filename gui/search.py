@@ -0,0 +1,79 @@
+"""Substring search index backing the ticker and coin-name comboboxes"""
+
+from collections import defaultdict
+
+
+class SearchIndex:
+    """Case-insensitive substring index over a list of strings.
+    Every 1-, 2- and 3-character substring of each (pre-lowercased) key is mapped to the
+    items containing it. Longer queries intersect the posting lists of their trigrams and
+    verify the candidates. When a query extends the previous one, the previous matches are
+    narrowed down instead of querying the index again.
+    Results are ranked exact symbol first, then prefix, then substring matches, and capped
+    at `limit` items."""
+
+    GRAM = 3
+
+    def __init__(self, items, limit: int = 100) -> None:
+        self.items = list(items)
+        self.keys = [item.lower() for item in self.items]
+        self.limit = limit
+        self._postings = defaultdict(list)
+        self._prefixes = defaultdict(list)
+        self._exact = defaultdict(list)
+        for i, key in enumerate(self.keys):
+            grams = {key[start:start + n]
+                     for n in range(1, self.GRAM + 1)
+                     for start in range(len(key) - n + 1)}
+            for gram in grams:
+                self._postings[gram].append(i)
+            for n in range(1, min(len(key), self.GRAM) + 1):
+                self._prefixes[key[:n]].append(i)
+            self._exact[key].append(i)
+            symbol = key.split("-")[0]
+            if symbol != key:
+                self._exact[symbol].append(i)
+
+        self._last_query = None
+        self._last_matches = None
+
+    def _matches(self, query: str) -> list:
+        if self._last_query and self._last_query in query:
+            return [i for i in self._last_matches if query in self.keys[i]]
+        if len(query) <= self.GRAM:
+            return self._postings.get(query, [])
+
+        grams = {query[start:start + self.GRAM] for start in range(len(query) - self.GRAM + 1)}
+        postings = sorted((self._postings.get(gram, []) for gram in grams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        return [i for i in sorted(candidates) if query in self.keys[i]]
+
+    def _prefix_matches(self, query: str) -> list:
+        if len(query) <= self.GRAM:
+            return self._prefixes.get(query, [])
+        return [i for i in self._prefixes.get(query[:self.GRAM], [])
+                if self.keys[i].startswith(query)]
+
+    def search(self, query: str) -> list:
+        query = query.lower()
+        if not query:
+            self._last_query = None
+            return self.items[:self.limit]
+
+        matches = self._matches(query)
+        self._last_query, self._last_matches = query, matches
+
+        result = []
+        seen = set()
+        for ranked in (self._exact.get(query, []), self._prefix_matches(query), matches):
+            for i in ranked:
+                if i not in seen:
+                    seen.add(i)
+                    result.append(self.items[i])
+                    if len(result) == self.limit:
+                        return result
+        return result
@@ -0,0 +1,98 @@
+"""Single asyncio event loop that runs the I/O triggered by user actions.
+The loop lives on one background thread. Work is submitted under a key; submitting again
+under the same key cancels the superseded task, so rapid clicking cannot pile up concurrent
+downloads. Blocking calls run on a pool of `max_concurrency` threads: a cancelled call that
+already started cannot be interrupted, but it still holds one of those threads until it
+returns, so at most `max_concurrency` of them ever run at once. Results are handed back to
+Tk through a queue polled with `after()`, so the callbacks always run on the Tk main loop."""
+
+import concurrent.futures
+import queue
+import threading
+
+
+class TaskRunner:
+
+    def __init__(self, max_concurrency=4) -> None:
+        self.max_concurrency = max_concurrency
+        self.loop = None
+        self._semaphore = None
+        self._executor = None
+        self._thread = None
+        self._results = queue.Queue()
+        self._current = {}  # key -> future of the latest task submitted under that key
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            # asyncio is imported with the first task rather than at startup
+            import asyncio
+
+            self.loop = asyncio.new_event_loop()
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                self.max_concurrency, thread_name_prefix="tasks-io")
+            self._thread = threading.Thread(target=self.loop.run_forever, daemon=True,
+                                            name="tasks")
+            self._thread.start()
+
+    async def _run(self, func, args):
+        import asyncio
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            if asyncio.iscoroutinefunction(func):
+                return await func(*args)
+            # blocking I/O (requests, pandas_datareader, GoogleNews) runs on the bounded pool
+            return await self.loop.run_in_executor(self._executor, func, *args)
+
+    def submit(self, key, func, *args, on_done=None, on_error=None):
+        """Run `func(*args)` on the loop, cancelling the task previously submitted as `key`.
+        `on_done(result)` / `on_error(exception)` are called on the Tk main loop by `pump`."""
+        import asyncio
+
+        self._ensure_started()
+        self.cancel(key)
+        future = asyncio.run_coroutine_threadsafe(self._run(func, args), self.loop)
+        with self._lock:
+            self._current[key] = future
+        future.add_done_callback(lambda f: self._results.put((key, f, on_done, on_error)))
+        return future
+
+    def cancel(self, key) -> None:
+        with self._lock:
+            future = self._current.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def cancel_all(self) -> None:
+        with self._lock:
+            keys = list(self._current)
+        for key in keys:
+            self.cancel(key)
+
+    def pump(self, widget, interval=50) -> None:
+        """Deliver finished results to their callbacks, polling every `interval` ms for as
+        long as `widget` exists"""
+        if not widget.winfo_exists():
+            return
+        while not self._results.empty():
+            key, future, on_done, on_error = self._results.get_nowait()
+            with self._lock:
+                if self._current.get(key) is future:
+                    del self._current[key]
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                if on_error is not None:
+                    on_error(future.exception())
+                else:
+                    print(future.exception())
+            elif on_done is not None:
+                on_done(future.result())
+        widget.after(interval, self.pump, widget, interval)
+
+
+runner = TaskRunner()
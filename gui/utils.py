@@ -2,11 +2,9 @@
 
 import tkinter as tk
 import webbrowser
-from PIL import Image, ImageTk
 from itertools import count, cycle
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from gui import assets
 
 
 class ImageLabel(tk.Label):
@@ -18,22 +16,25 @@ class ImageLabel(tk.Label):
 
     def load(self, im):
         if isinstance(im, str):
-            im = Image.open(im)
-        frames = []
-
-        try:
-            for i in count(1):
-                frames.append(ImageTk.PhotoImage(im.copy()))
-                im.seek(i)
-        except EOFError:
-            pass
+            # decoded once per process and shared by every label showing the same file
+            frames, self.delay = assets.gif_frames(im)
+        else:
+            from PIL import ImageTk
+
+            frames = []
+            try:
+                for i in count(1):
+                    frames.append(ImageTk.PhotoImage(im.copy()))
+                    im.seek(i)
+            except EOFError:
+                pass
+
+            try:
+                self.delay = im.info['duration']
+            except:
+                self.delay = 100
         self.frames = cycle(frames)
 
-        try:
-            self.delay = im.info['duration']
-        except:
-            self.delay = 100
-
         if len(frames) == 1:
             self.config(image=next(self.frames))
         else:
@@ -49,26 +50,124 @@ class ImageLabel(tk.Label):
             self.after(self.delay, self.next_frame)
 
 
-def transform_ticker(ticker: str) -> str:
-    ticker_no_x = ticker.split(":")[1]
-    curr = ticker_no_x[-3:]
-    base = ticker_no_x[:-3]
-    return base + "-" + curr
-
-
-def build_chart(frame, ticker, table=None, legend=None):
-    if table.empty:
-        error_label = tk.Label(frame, text=f"Could not load data for {ticker}",
-                                    font=("MS Serif", 15, "bold"))
-        error_label.grid(row=2, column=1)
-        return
-    figure = plt.Figure(figsize=(7, 5.5), dpi=100)
-    ax = figure.add_subplot(111)
-    table["Close"].plot(kind="line", title="Historical Data Graph", ax=ax)
-    ax.legend(legend)
-    chart_type = FigureCanvasTkAgg(figure, frame)
-    chart_type.draw()
-    chart_type.get_tk_widget().grid(row=2, column=0, columnspan=3)
+class VirtualList(tk.Frame):
+    """
+    A scrollable list that only renders the visible window of its items.
+    A fixed pool of `visible_rows` row widgets is built once with `build_row(parent)`, and
+    scrolling or paging only refills them with `fill_row(row, item)`, so the cost of an
+    update does not depend on the number of items.
+    """
+
+    def __init__(self, parent, visible_rows, build_row, fill_row, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.items = []
+        self.offset = 0
+        self.visible_rows = visible_rows
+        self.fill_row = fill_row
+
+        self.rows = []
+        for i in range(visible_rows):
+            row = build_row(self)
+            row.grid(row=i, column=0, sticky=tk.W)
+            self.rows.append(row)
+
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, rowspan=visible_rows, sticky=tk.NS)
+        # the wheel scrolls the list while the pointer is over it
+        self.bind("<Enter>", lambda event: self.bind_all("<MouseWheel>", self._on_mousewheel))
+        self.bind("<Leave>", self._on_leave)
+
+        pager = tk.Frame(self)
+        pager.grid(row=visible_rows, column=0, columnspan=2)
+        tk.Button(pager, text="<", command=lambda: self.scroll_to(self.offset - visible_rows)) \
+            .grid(row=0, column=0)
+        self.page_label = tk.Label(pager)
+        self.page_label.grid(row=0, column=1, padx=10)
+        tk.Button(pager, text=">", command=lambda: self.scroll_to(self.offset + visible_rows)) \
+            .grid(row=0, column=2)
+        self._render()
+
+    def set_items(self, items):
+        self.items = list(items)
+        self.scroll_to(0)
+
+    def scroll_to(self, offset):
+        max_offset = max(len(self.items) - self.visible_rows, 0)
+        self.offset = min(max(int(offset), 0), max_offset)
+        self._render()
+
+    def _render(self):
+        for i, row in enumerate(self.rows):
+            if self.offset + i < len(self.items):
+                self.fill_row(row, self.items[self.offset + i])
+                row.grid()
+            else:
+                row.grid_remove()
+
+        total = len(self.items)
+        if total:
+            self.scrollbar.set(self.offset / total,
+                               min(self.offset + self.visible_rows, total) / total)
+            pages = -(-total // self.visible_rows)
+            self.page_label.config(text=f"{self.offset // self.visible_rows + 1} / {pages}")
+        else:
+            self.scrollbar.set(0, 1)
+            self.page_label.config(text="")
+
+    def _on_scrollbar(self, action, *args):
+        if action == tk.MOVETO:
+            self.scroll_to(float(args[0]) * len(self.items))
+        elif args[1] == tk.PAGES:
+            self.scroll_to(self.offset + int(args[0]) * self.visible_rows)
+        else:
+            self.scroll_to(self.offset + int(args[0]))
+
+    def _on_leave(self, event):
+        # the frame also gets <Leave> when the pointer moves onto one of the rows or the
+        # scrollbar (tkinter does not pass the event detail), so check where the pointer is
+        widget = self.winfo_containing(event.x_root, event.y_root)
+        if widget is None or not (str(widget) + ".").startswith(str(self) + "."):
+            self.unbind_all("<MouseWheel>")
+
+    def _on_mousewheel(self, event):
+        self.scroll_to(self.offset - (1 if event.delta > 0 else -1))
+
+
+class DebugOverlay(tk.Label):
+    """The last operation timings recorded by the metrics, drawn over the current screen.
+    Toggled with F12 and refreshed every `interval` ms while it is shown."""
+
+    def __init__(self, root, metrics, rows=15, interval=500):
+        super().__init__(root, justify=tk.LEFT, anchor="nw", font=("Courier", 9),
+                         bg="black", fg="#00ff00")
+        self.metrics = metrics
+        self.rows = rows
+        self.interval = interval
+        self.visible = False
+        root.bind_all("<F12>", lambda event: self.toggle())
+
+    def toggle(self):
+        self.visible = not self.visible
+        if self.visible:
+            self.place(relx=1.0, x=-10, y=10, anchor="ne")
+            self.refresh()
+        else:
+            self.place_forget()
+
+    def refresh(self):
+        if not self.visible or not self.winfo_exists():
+            return
+        lines = []
+        for span in self.metrics.recent(self.rows):
+            labels = ",".join(f"{key}={value}" for key, value in span.labels.items())
+            flag = " !" if span.error else ""
+            lines.append(f"{span.name:<24} {labels:<28} {span.seconds * 1000:9.1f} ms{flag}")
+        in_flight = [f"{gauge['name']} {gauge['labels'].get('host', '')} {gauge['value']}"
+                     for gauge in self.metrics.snapshot()["gauges"] if gauge["value"]]
+        self.config(text="\n".join(lines + in_flight) or "No operation timed yet")
+        # a screen raised with tkraise would otherwise cover the overlay
+        self.lift()
+        self.after(self.interval, self.refresh)
 
 
 def open_url(url: str):
@@ -1,12 +1,30 @@
+import time
+
+# taken before the other imports, so that the startup timings include them
+STARTED_AT = time.perf_counter()
+# pylint: disable=wrong-import-position
+
 import configparser
 
-from gui.gui import StartScreen
+from gui import assets
+from gui import bootstrap
+from gui.gui import ScreenManager, StartScreen
 
 
 def main():
+    bootstrap.start(STARTED_AT)
     config = configparser.ConfigParser()
     config.read("config.ini")
-    app = StartScreen(config)
+    app = ScreenManager(config, max_screens=config["gui"].getint("max_screens"))
+    app.show(StartScreen)
+    app.root.after(0, lambda: bootstrap.report_startup(app.root))
+    # decode the assets of the other screens while the user looks at the first one
+    app.root.after(200, lambda: assets.preload(
+        images=[(r"static\background.jpg", None), (r"static\background2.jpg", None)],
+        gifs=[r"static\loading.gif"]))
+    # the heavy dependencies of the other screens are imported off the main thread meanwhile
+    app.root.after(500, lambda: bootstrap.preload_modules(
+        ["tkcalendar", "gui.chart", "api_client.analytics", "api_client.export"]))
     app.run()
 
 
@@ -0,0 +1,144 @@
+import datetime
+import types
+
+import pandas as pd
+import pytest
+
+from api_client import cache
+from api_client.cache import FIELDS, HistCache
+
+TICKER = "BTC-USD"
+
+
+class Clock:
+    """Stands in for the wall clock of the cache module"""
+
+    def __init__(self, now: datetime.datetime) -> None:
+        self.now = now
+
+    def set(self, *args) -> None:
+        self.now = datetime.datetime(*args)
+
+    def advance(self, **kwargs) -> None:
+        self.now += datetime.timedelta(**kwargs)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(datetime.datetime(2023, 5, 10, 12))
+
+    class FakeDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return clock.now.date()
+
+    monkeypatch.setattr(cache, "datetime", types.SimpleNamespace(
+        date=FakeDate, datetime=datetime.datetime, time=datetime.time,
+        timedelta=datetime.timedelta))
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(
+        time=lambda: clock.now.timestamp()))
+    return clock
+
+
+@pytest.fixture
+def hist_cache(tmp_path, clock):
+    return HistCache(str(tmp_path / "hist.sqlite"), today_ttl=300, empty_ttl=3600)
+
+
+def day(n):
+    return datetime.date(2023, 5, n)
+
+
+def bars(first, last):
+    dates = pd.date_range(day(first), day(last), name="Date")
+    return pd.DataFrame({field: 1.0 for field in FIELDS}, index=dates)
+
+
+def test_missing_ranges_of_an_empty_cache(hist_cache):
+    assert hist_cache.missing_ranges(TICKER, day(1), day(5)) == [(day(1), day(5))]
+
+
+def test_future_days_are_never_requested(hist_cache):
+    assert hist_cache.missing_ranges(TICKER, day(8), day(20)) == [(day(8), day(10))]
+    assert hist_cache.missing_ranges(TICKER, day(11), day(20)) == []
+
+
+def test_only_the_gaps_are_missing(hist_cache):
+    hist_cache.store(TICKER, bars(3, 4), day(3), day(4))
+    hist_cache.store(TICKER, bars(7, 8), day(7), day(8))
+    assert hist_cache.missing_ranges(TICKER, day(1), day(9)) == [
+        (day(1), day(2)), (day(5), day(6)), (day(9), day(9))]
+
+
+def test_touching_and_overlapping_ranges_are_merged(hist_cache):
+    hist_cache.store(TICKER, bars(1, 3), day(1), day(3))
+    hist_cache.store(TICKER, bars(6, 7), day(6), day(7))
+    hist_cache.store(TICKER, bars(4, 5), day(4), day(5))
+    hist_cache.store(TICKER, bars(2, 8), day(2), day(8))
+    assert [(start, end) for start, end, _ in hist_cache._ranges(TICKER)] == [(day(1), day(8))]
+    assert hist_cache.missing_ranges(TICKER, day(1), day(8)) == []
+
+
+def test_today_is_refetched_after_today_ttl(hist_cache, clock):
+    hist_cache.store(TICKER, bars(5, 10), day(5), day(10))
+    assert hist_cache.missing_ranges(TICKER, day(5), day(10)) == []
+    clock.advance(seconds=301)
+    assert hist_cache.missing_ranges(TICKER, day(5), day(10)) == [(day(10), day(10))]
+    # a request ending before today does not care about today's bar
+    assert hist_cache.missing_ranges(TICKER, day(5), day(9)) == []
+
+
+def test_a_day_fetched_while_trading_is_fetched_again(hist_cache, clock):
+    hist_cache.store(TICKER, bars(5, 10), day(5), day(10))
+    clock.set(2023, 5, 11, 9)
+    assert hist_cache.missing_ranges(TICKER, day(5), day(11)) == [(day(10), day(11))]
+    assert hist_cache.missing_ranges(TICKER, day(5), day(9)) == []
+
+    hist_cache.store(TICKER, bars(10, 11), day(10), day(11))
+    clock.set(2023, 5, 12, 9)
+    assert hist_cache.missing_ranges(TICKER, day(5), day(12)) == [(day(11), day(12))]
+
+
+def test_a_day_refetched_after_its_end_is_final(hist_cache, clock):
+    hist_cache.store(TICKER, bars(5, 10), day(5), day(10))
+    clock.set(2023, 5, 11, 9)
+    hist_cache.store(TICKER, bars(10, 10), day(10), day(10))
+    clock.set(2023, 5, 20, 9)
+    assert hist_cache.missing_ranges(TICKER, day(5), day(10)) == []
+
+
+def test_a_single_partial_day_is_fetched_again(hist_cache, clock):
+    hist_cache.store(TICKER, bars(10, 10), day(10), day(10))
+    clock.set(2023, 5, 11, 9)
+    assert hist_cache.missing_ranges(TICKER, day(10), day(10)) == [(day(10), day(10))]
+
+
+def test_an_empty_range_expires(hist_cache, clock):
+    hist_cache.store(TICKER, bars(1, 1).iloc[:0], day(1), day(4))
+    assert hist_cache.missing_ranges(TICKER, day(1), day(5)) == [(day(5), day(5))]
+    clock.advance(seconds=3601)
+    assert hist_cache.missing_ranges(TICKER, day(1), day(5)) == [(day(1), day(5))]
+
+
+def test_an_empty_range_ending_today_expires_after_today_ttl(hist_cache, clock):
+    hist_cache.store(TICKER, bars(1, 1).iloc[:0], day(8), day(10))
+    assert hist_cache.missing_ranges(TICKER, day(8), day(10)) == []
+    clock.advance(seconds=301)
+    assert hist_cache.missing_ranges(TICKER, day(8), day(10)) == [(day(8), day(10))]
+
+
+def test_an_empty_range_does_not_merge(hist_cache, clock):
+    hist_cache.store(TICKER, bars(1, 3), day(1), day(3))
+    hist_cache.store(TICKER, bars(1, 1).iloc[:0], day(4), day(5))
+    clock.advance(seconds=3601)
+    assert hist_cache.missing_ranges(TICKER, day(1), day(6)) == [(day(4), day(6))]
+
+
+def test_store_keeps_the_bars_and_rollups(hist_cache):
+    table = bars(1, 9)
+    table["Close"] = range(1, 10)
+    hist_cache.store(TICKER, table, day(1), day(9))
+    loaded = hist_cache.load(TICKER, day(1), day(9))
+    assert list(loaded["Close"]) == list(range(1, 10))
+    weekly = hist_cache.load_rollup(TICKER, "week", day(1), day(9))
+    assert list(weekly["Close"]) == [7.0, 9.0]